@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+
+import inference
+import metrics
+import storage
+
+# ----------------------------
+# HTTP INFERENCE API
+# ----------------------------
+# Usage: python api.py [--port 8000] [--workers 4] [--max-batch-size 64] [--max-wait-ms 0]
+# A plain ASGI app (served by uvicorn) next to the Streamlit UI:
+#   POST /predict        {"text": "...", "username": "...", "save": true}
+#   POST /predict_batch  {"texts": ["...", ...], "username": "...", "save": true}
+#   POST /search         {"q": "refund", "prediction": "Negative", "username": "...",
+#                         "start": "2025-11-01", "end": "2025-12-01", "after": null, "limit": 50}
+#   GET  /health
+#   GET  /metrics        Prometheus text format
+# Each worker process loads the mmap model artifact once. Concurrent
+# /predict calls are combined by an inference.MicroBatcher, and results are
+# stored through storage.save_to_db like the Reddit path (bare
+# "Positive"/"Negative" labels) unless "save" is false.
+MAX_BATCH_SIZE = int(os.environ.get("SENTIMINDS_MAX_BATCH_SIZE", 64))
+MAX_WAIT = float(os.environ.get("SENTIMINDS_MAX_WAIT_MS", 0)) / 1000
+MAX_TEXTS_PER_REQUEST = 10000
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_SEARCH_LIMIT = 500
+DEFAULT_USERNAME = "api"
+
+
+class BadRequest(Exception):
+    pass
+
+
+class ModelState:
+    # per worker process; reloads when the model pickle or its calibration
+    # file is replaced
+
+    def __init__(self):
+        self.stamp = None
+        self.scorer = None
+        self.calibration_stamp = None
+        self.calibrator = None
+        self.batcher = inference.MicroBatcher(self._predict, MAX_BATCH_SIZE, MAX_WAIT)
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        stamp = inference.model_stamp()
+        if stamp != self.stamp:
+            with self._lock:
+                if stamp != self.stamp:
+                    self.scorer = inference.load_scorer()
+                    self.stamp = stamp
+        calibration_stamp = inference.calibration_stamp()
+        if calibration_stamp != self.calibration_stamp:
+            with self._lock:
+                if calibration_stamp != self.calibration_stamp:
+                    self.calibrator = inference.load_calibrator()
+                    self.calibration_stamp = calibration_stamp
+        return self
+
+    def _predict(self, texts):
+        return inference.cached_predict_batch(self.scorer, texts)
+
+    def results(self, texts, predictions, scores):
+        confidences = inference.confidence_scores(scores, self.calibrator)
+        return [{"text": text, "prediction": int(p), "label": inference.sentiment_label(p),
+                 "score": float(s), "confidence": float(c)}
+                for text, p, s, c in zip(texts, predictions, scores, confidences)]
+
+
+MODEL = None
+
+
+def _model():
+    global MODEL
+    if MODEL is None:
+        MODEL = ModelState()
+    return MODEL.refresh()
+
+
+def _save(body, results, model_version):
+    if body.get("save", True):
+        username = body.get("username") or DEFAULT_USERNAME
+        for r in results:
+            storage.save_to_db(username, r["text"], r["label"], r["confidence"],
+                               score=r["score"], model_version=model_version)
+
+
+# ----------------------------
+# ROUTES
+# ----------------------------
+async def predict(body):
+    text = body.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise BadRequest('"text" must be a non-empty string')
+    model = _model()
+    prediction, score = await asyncio.wrap_future(model.batcher.submit(text))
+    result = model.results([text], [prediction], [score])[0]
+    _save(body, [result], model.scorer.version)
+    return 200, result
+
+
+async def predict_batch(body):
+    texts = body.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        raise BadRequest('"texts" must be a list of strings')
+    if len(texts) > MAX_TEXTS_PER_REQUEST:
+        raise BadRequest(f"at most {MAX_TEXTS_PER_REQUEST} texts per request")
+    model = _model()
+    # already a batch: score it directly, off the event loop
+    predictions, scores = await asyncio.get_running_loop().run_in_executor(
+        None, inference.cached_predict_batch, model.scorer, texts)
+    results = model.results(texts, predictions, scores)
+    _save(body, results, model.scorer.version)
+    return 200, {"results": results}
+
+
+async def search(body):
+    # one page of stored predictions matching the keywords; pass "next" back
+    # as "after" for the following page
+    query = body.get("q")
+    if not isinstance(query, str) or not query.strip():
+        raise BadRequest('"q" must be a non-empty string')
+    prediction = body.get("prediction")
+    if prediction not in (None, "Positive", "Negative"):
+        raise BadRequest('"prediction" must be "Positive" or "Negative"')
+    for field in ("username", "start", "end"):
+        if body.get(field) is not None and not isinstance(body[field], str):
+            raise BadRequest(f'"{field}" must be a string')
+    for field in ("start", "end"):
+        try:
+            if body.get(field) is not None:
+                storage.to_epoch(body[field])
+        except ValueError:
+            raise BadRequest(f'"{field}" must be a date, "YYYY-MM-DD[ HH:MM:SS]"') from None
+    after, limit = body.get("after"), body.get("limit", 50)
+    if after is not None and not isinstance(after, int):
+        raise BadRequest('"after" must be the "next" value of the previous page')
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise BadRequest(f'"limit" must be between 1 and {MAX_SEARCH_LIMIT}')
+
+    def run():
+        storage.flush_writes(storage.FLUSH_TIMEOUT)  # include predictions still queued in this process
+        return storage.search_sentiment(query, prediction, body.get("username"), body.get("start"),
+                                        body.get("end"), after, limit)
+
+    rows, next_cursor = await asyncio.get_running_loop().run_in_executor(None, run)
+    return 200, {"results": rows, "next": next_cursor}
+
+
+async def health(body):
+    return 200, {"status": "ok", "model_version": _model().scorer.version}
+
+
+async def metrics_endpoint(body):
+    return 200, metrics.REGISTRY.render()
+
+
+ROUTES = {
+    ("POST", "/predict"): predict,
+    ("POST", "/predict_batch"): predict_batch,
+    ("POST", "/search"): search,
+    ("GET", "/health"): health,
+    ("GET", "/metrics"): metrics_endpoint,
+}
+
+
+# ----------------------------
+# ASGI APP
+# ----------------------------
+async def _read_json(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise BadRequest("request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    try:
+        body = json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        raise BadRequest("request body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("request body must be a JSON object")
+    return body
+
+
+async def _send_json(send, status, payload):
+    # str payloads (the /metrics page) are sent as Prometheus text
+    if isinstance(payload, str):
+        data, content_type = payload.encode("utf-8"), metrics.CONTENT_TYPE.encode()
+    else:
+        data, content_type = json.dumps(payload).encode("utf-8"), b"application/json"
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type), (b"content-length", str(len(data)).encode())]})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            storage.create_main_tables()
+            _model()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if MODEL is not None:
+                MODEL.batcher.close()
+            storage.flush_writes()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = ROUTES.get((scope["method"], scope["path"]))
+    if route is None:
+        await _send_json(send, 404, {"error": "not found"})
+        return
+    try:
+        body = await _read_json(receive) if scope["method"] == "POST" else {}
+        with metrics.timed("api " + scope["path"]):
+            status, payload = await route(body)
+    except BadRequest as e:
+        status, payload = 400, {"error": str(e)}
+    await _send_json(send, status, payload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiminds HTTP inference API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    # worker processes re-import this module, so settings travel via env
+    os.environ["SENTIMINDS_MAX_BATCH_SIZE"] = str(args.max_batch_size)
+    os.environ["SENTIMINDS_MAX_WAIT_MS"] = str(args.max_wait_ms)
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
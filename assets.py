@@ -0,0 +1,104 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import threading
+
+# ----------------------------
+# STATIC ASSETS
+# ----------------------------
+# Usage: python assets.py   (rebuild static/ after changing a source image)
+# The page images are shrunk to the size they are shown at, converted to
+# WebP and written to static/ under content-hashed names, which Streamlit
+# serves at app/static/<name> when server.enableStaticServing is on (see
+# .streamlit/config.toml). Pages then reference a short URL the browser
+# caches across reruns instead of re-sending megabytes of inline base64
+# every interaction. Without static serving the optimized file is inlined
+# as a data URI, encoded once per process.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+MANIFEST_PATH = os.path.join(STATIC_DIR, "manifest.json")
+STATIC_URL = "app/static"
+WEBP_QUALITY = 80
+
+# source image -> longest side in pixels once optimized
+ASSETS = {
+    "back.png": 1920,   # full-window background
+    "logo.png": 96,     # shown at 30-40 px, 2x for high-DPI screens
+    "pic_1.png": 1000,  # landing page illustration, half the page wide
+}
+
+_lock = threading.Lock()
+
+
+def _source_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def build_asset(source, max_side, static_dir=STATIC_DIR):
+    # Returns the manifest entry for `source`, writing the optimized file
+    from PIL import Image
+
+    digest = _source_hash(source)
+    with Image.open(source) as image:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        os.makedirs(static_dir, exist_ok=True)
+        name = f"{os.path.splitext(os.path.basename(source))[0]}.{digest}.webp"
+        image.save(os.path.join(static_dir, name), "WEBP", quality=WEBP_QUALITY, method=6)
+        size = image.size
+    return {"file": name, "source_sha": digest, "width": size[0], "height": size[1],
+            "bytes": os.path.getsize(os.path.join(static_dir, name))}
+
+
+def build_all(static_dir=STATIC_DIR):
+    manifest = {source: build_asset(source, max_side, static_dir) for source, max_side in ASSETS.items()}
+    with open(os.path.join(static_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    # drop outputs of older source versions
+    keep = {entry["file"] for entry in manifest.values()} | {"manifest.json"}
+    for name in os.listdir(static_dir):
+        if name not in keep:
+            os.remove(os.path.join(static_dir, name))
+    return manifest
+
+
+@functools.lru_cache(maxsize=None)
+def _entry(source):
+    # Checked once per process: a missing or outdated build (source image
+    # changed since) is rebuilt here rather than served stale
+    with _lock:
+        try:
+            with open(MANIFEST_PATH) as f:
+                entry = json.load(f).get(source)
+        except (OSError, ValueError):
+            entry = None
+        if (entry is None or not os.path.exists(os.path.join(STATIC_DIR, entry["file"]))
+                or entry["source_sha"] != _source_hash(source)):
+            entry = build_asset(source, ASSETS.get(source, 1920))
+        return entry
+
+
+@functools.lru_cache(maxsize=None)
+def _data_uri(path):
+    with open(path, "rb") as f:
+        return "data:image/webp;base64," + base64.b64encode(f.read()).decode()
+
+
+def asset_path(source):
+    # local path of the optimized file
+    return os.path.join(STATIC_DIR, _entry(source)["file"])
+
+
+def asset_url(source, static_serving=True):
+    # URL (or data URI) of the optimized version of `source`, e.g. "logo.png"
+    entry = _entry(source)
+    if static_serving:
+        return f"{STATIC_URL}/{entry['file']}"
+    return _data_uri(asset_path(source))
+
+
+if __name__ == "__main__":
+    for source, entry in build_all().items():
+        print(f"{source}: {os.path.getsize(source):,} -> {entry['bytes']:,} bytes "
+              f"({entry['width']}x{entry['height']} WebP) static/{entry['file']}")
@@ -0,0 +1,85 @@
+import argparse
+import sys
+import time
+from collections import deque
+
+import classify
+import inference
+import storage
+
+# ----------------------------
+# MODEL BACKFILL
+# ----------------------------
+# Usage: python backfill.py [--db senti.db] [--chunk-size 500] [--workers 1] [--pause 0] [--status]
+# Re-scores every sentiment_data row not yet scored by the current model
+# and fills in label, score, confidence and model_version (prediction is
+# rewritten to the bare label, so old "😊 Positive" rows become consistent
+# with the rest). Safe to stop at any time and run again: it resumes from
+# the checkpoint in backfill_progress. Each chunk is scored outside any
+# transaction and written in one short one, so the live app keeps writing;
+# --pause adds a sleep between chunks to leave it more headroom.
+CHUNK_SIZE = 500
+
+
+def _stale_chunks(model_version, after_id, chunk_size, db_path, ids):
+    # text chunks for the scorer; each chunk's ids are queued on `ids` in
+    # the same order, since classify_chunks returns results in input order
+    while True:
+        rows = storage.stale_sentiment_rows(model_version, after_id, chunk_size, db_path)
+        if not rows:
+            return
+        ids.append([row_id for row_id, _ in rows])
+        after_id = rows[-1][0]
+        yield [text or "" for _, text in rows]
+
+
+def run_backfill(db_path=storage.DB_PATH, chunk_size=CHUNK_SIZE, workers=1, pause=0.0, progress=None):
+    # Returns the number of rows re-scored by this run. progress(done) is
+    # called after each committed chunk.
+    storage.create_main_tables(db_path)
+    model_version = inference.model_version()
+    calibrator = inference.load_calibrator()
+    checkpoint = storage.backfill_checkpoint(model_version, db_path)
+    # a finished run starts over to pick up rows written since by older app processes
+    after_id = checkpoint["last_id"] if checkpoint and not checkpoint["finished_at"] else 0
+
+    ids, done = deque(), 0
+    chunks = _stale_chunks(model_version, after_id, chunk_size, db_path, ids)
+    for texts, predictions, scores in classify.classify_chunks(chunks, workers):
+        row_ids = ids.popleft()
+        confidences = inference.confidence_scores(scores, calibrator)
+        storage.apply_backfill_chunk(
+            model_version,
+            [(inference.sentiment_label(p), float(s), float(c), row_id)
+             for p, s, c, row_id in zip(predictions, scores, confidences, row_ids)],
+            row_ids[-1], db_path)
+        done += len(row_ids)
+        if progress is not None:
+            progress(done)
+        if pause:
+            time.sleep(pause)
+    storage.finish_backfill(model_version, db_path)
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score sentiment_data with the current model")
+    parser.add_argument("--db", default=storage.DB_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="scoring processes (see classify.py)")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+    parser.add_argument("--status", action="store_true", help="only report progress for the current model")
+    args = parser.parse_args()
+
+    storage.create_main_tables(args.db)
+    version = inference.model_version()
+    if args.status:
+        print(f"model {version}: {storage.count_stale_rows(version, args.db):,} rows to re-score")
+        print(f"checkpoint: {storage.backfill_checkpoint(version, args.db)}")
+        sys.exit(0)
+
+    total = storage.count_stale_rows(version, args.db)
+    start = time.perf_counter()
+    n = run_backfill(args.db, args.chunk_size, args.workers, args.pause,
+                     progress=lambda done: print(f"\r{done:,}/{total:,} rows", end="", file=sys.stderr))
+    print(f"\nRe-scored {n:,} rows with model {version} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
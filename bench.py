@@ -0,0 +1,829 @@
+import argparse
+import functools
+import json
+import platform
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import bulk
+import classify
+import compact
+import export
+import fake_reddit
+import inference
+import reddit_ingest
+import storage
+import wordclouds
+
+# ----------------------------
+# SYNTHETIC DATA
+# ----------------------------
+def synthetic_posts(model, n, words_per_post=30, seed=0):
+    # Build Reddit-sized posts from the model's own unigram vocabulary so
+    # the benchmark runs offline and exercises real feature lookups.
+    rng = random.Random(seed)
+    vocab = sorted(t for t in model[0].vocabulary_ if " " not in t)
+    return [" ".join(rng.choices(vocab, k=words_per_post)) for _ in range(n)]
+
+
+RARE_WORD, RARE_WORD_SHARE = "refund", 0.001  # a selective search term; the WORDS are in ~45% of rows
+
+
+def synthetic_sentiment_rows(n, users=50, days=365, seed=0, repeat_share=0.0):
+    # Chunks of (username, text, label, confidence, epoch seconds, score)
+    # rows spread over `users` users and `days` days. A repeat_share of the
+    # rows re-analyze an earlier text, as when the same posts are fetched
+    # and scored again.
+    rng, rare = random.Random(seed), random.Random(seed + 1)
+    start = datetime(2025, 1, 1).timestamp()
+    texts = []
+    for offset in range(0, n, 50000):
+        rows = []
+        for _ in range(min(50000, n - offset)):
+            label = rng.choice(("Positive", "Negative"))
+            stamp = int(start + rng.random() * days * 86400)
+            if repeat_share and texts and rng.random() < repeat_share:
+                text = rng.choice(texts)
+            else:
+                text = " ".join(rng.choices(fake_reddit.WORDS, k=12))
+                if rare.random() < RARE_WORD_SHARE:
+                    text += " " + RARE_WORD
+                if repeat_share:
+                    texts.append(text)
+            rows.append((f"user{rng.randrange(users)}", text, label, rng.random(), stamp, rng.gauss(0, 1)))
+        yield rows
+
+
+def synthetic_sentiment_db(path, n, users=50, days=365, seed=0, repeat_share=0.0):
+    # A database of n synthetic predictions. Rows are bulk-loaded without
+    # the rollup and search index triggers, which are then recreated with
+    # both rebuilt once.
+    storage.create_main_tables(path)
+    conn = sqlite3.connect(path)
+    for action in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_predictions_rollup_{action}")
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_predictions_fts_{action}")
+    conn.execute("DROP TABLE sentiment_rollup")
+    conn.execute("DROP TABLE sentiment_fts")
+    for rows in synthetic_sentiment_rows(n, users, days, seed, repeat_share):
+        with storage.write_transaction(conn):
+            text_ids = storage.store_texts(conn, [row[1] for row in rows])
+            conn.executemany(storage.INSERT_PREDICTION,
+                             [(user, text_id, storage.LABELS.index(label), confidence, stamp, score, "bench")
+                              for (user, _, label, confidence, stamp, score), text_id in zip(rows, text_ids)])
+    storage.create_prediction_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+    return path
+
+
+def synthetic_legacy_db(path, n, users=50, days=365, seed=0, repeat_share=0.0):
+    # The same rows in the layout before migration 8: one sentiment_data
+    # row per prediction with its full text and a string timestamp
+    conn = sqlite3.connect(path)
+    storage.migrate(conn, target=7)
+    for action in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_sentiment_rollup_{action}")
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_sentiment_fts_{action}")
+    conn.execute("DROP TABLE sentiment_rollup")
+    conn.execute("DROP TABLE sentiment_fts")
+    sql = ("INSERT INTO sentiment_data (username, text, prediction, confidence, timestamp, label, score, "
+           "model_version) VALUES (?,?,?,?,?,?,?,?)")
+    for rows in synthetic_sentiment_rows(n, users, days, seed, repeat_share):
+        conn.executemany(sql, [(user, text, label, confidence,
+                                datetime.fromtimestamp(stamp).strftime("%Y-%m-%d %H:%M:%S"), label, score, "bench")
+                               for user, text, label, confidence, stamp, score in rows])
+        conn.commit()
+    storage.create_rollup_tables(conn.cursor())
+    storage.create_search_index(conn.cursor())
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return path
+
+
+def _timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# ----------------------------
+# BENCHMARKS
+# ----------------------------
+def bench_batch_predict(model, sizes=(1, 10, 100, 1000, 10000), loop_limit=1000):
+    results = []
+    posts = synthetic_posts(model, max(sizes))
+    for size in sizes:
+        batch = posts[:size]
+        batched = _timed(inference.predict_batch, model, batch)
+        row = {"batch_size": size, "batched_posts_per_s": size / batched}
+        # the old per-post loop is too slow to time at the largest sizes
+        if size <= loop_limit:
+            looped = _timed(lambda b: [model.predict([p])[0] for p in b], batch)
+            row["looped_posts_per_s"] = size / looped
+        results.append(row)
+    return results
+
+
+def print_batch_predict(results):
+    print(f"{'batch':>8} {'batched posts/s':>18} {'looped posts/s':>18}")
+    for row in results:
+        looped = row.get("looped_posts_per_s")
+        looped = f"{looped:18.0f}" if looped is not None else f"{'-':>18}"
+        print(f"{row['batch_size']:>8} {row['batched_posts_per_s']:18.0f} {looped}")
+
+
+def check_scorer_parity(model, n=5000):
+    # LinearScorer must agree with the sklearn pipeline it was extracted from
+    posts = synthetic_posts(model, n, seed=1) + [
+        "", "!!!", "I LOVE this, not bad at all", "Ünïcode café, naïve résumé", "great great great",
+    ]
+    scorer = inference.LinearScorer.from_pipeline(model)
+    predictions, scores = scorer.predict_batch(posts)
+    expected = model.decision_function(posts)
+    max_diff = float(np.abs(scores - expected).max())
+    assert np.array_equal(predictions, model.predict(posts)), "LinearScorer labels differ from model.predict"
+    assert max_diff < 1e-9, f"LinearScorer scores differ from decision_function by {max_diff}"
+    return {"texts": len(posts), "max_score_diff": max_diff}
+
+
+def bench_single_latency(model, n=2000):
+    scorer = inference.LinearScorer.from_pipeline(model)
+    posts = synthetic_posts(model, n, words_per_post=20, seed=2)
+    rows = {
+        "pipeline_predict": lambda p: model.predict([p]),
+        "predict_batch": lambda p: inference.predict_batch(model, [p]),
+        "linear_scorer": scorer.score,
+    }
+    results = []
+    for name, fn in rows.items():
+        timings = []
+        for post in posts[:n if name == "linear_scorer" else n // 10]:
+            start = time.perf_counter()
+            fn(post)
+            timings.append(time.perf_counter() - start)
+        timings = np.array(timings) * 1e6
+        results.append({"engine": name, "p50_us": float(np.percentile(timings, 50)),
+                        "p99_us": float(np.percentile(timings, 99))})
+    return results
+
+
+def print_single_latency(results):
+    print(f"{'engine':>18} {'p50 us':>10} {'p99 us':>10}")
+    for row in results:
+        print(f"{row['engine']:>18} {row['p50_us']:10.1f} {row['p99_us']:10.1f}")
+
+
+_STARTUP_SNIPPETS = {
+    "joblib_pickle": "import inference; inference.load_model({model!r})",
+    "mmap_artifact": "import inference; inference.LinearScorer.load({artifact!r})",
+    # what the app's load_model_local runs: version check + artifact load
+    "load_scorer": "import inference; inference.load_scorer({model!r}, {artifact!r})",
+}
+
+
+def bench_startup(model_path=inference.MODEL_PATH, artifact_dir=inference.ARTIFACT_DIR, repeat=5):
+    # Each load runs in a fresh interpreter so imports are part of the cold
+    # start, as they are for a new Streamlit server process.
+    results = []
+    for name, snippet in _STARTUP_SNIPPETS.items():
+        code = ("import time, warnings; warnings.simplefilter('ignore'); t = time.perf_counter(); "
+                + snippet.format(model=model_path, artifact=artifact_dir)
+                + "; print(time.perf_counter() - t)")
+        timings = [float(subprocess.check_output([sys.executable, "-c", code], text=True))
+                   for _ in range(repeat)]
+        results.append({"loader": name, "best_ms": min(timings) * 1e3,
+                        "median_ms": float(np.median(timings)) * 1e3})
+    return results
+
+
+def print_startup(results):
+    print(f"{'loader':>16} {'best ms':>10} {'median ms':>10}")
+    for row in results:
+        print(f"{row['loader']:>16} {row['best_ms']:10.1f} {row['median_ms']:10.1f}")
+
+
+def _import_times(module):
+    # {name: cumulative us} for `module` and its direct imports, from
+    # `python -X importtime` in a fresh interpreter (children are printed
+    # before their parent, one level deeper)
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, check=True).stderr
+    times, children = {}, {}
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # "| ne", "|   storage", ...
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                times = dict(children, **{module: int(cumulative)})
+            children = {}
+    return times
+
+
+def bench_imports(modules=("ne", "api", "classify", "backfill"), repeat=3, top=5):
+    # Cold import cost of each entry point, i.e. what a new server or CLI
+    # process pays before doing anything, and its heaviest direct imports.
+    # Compare two --json runs to see the effect of moving an import.
+    results = {"modules": [], "heaviest": []}
+    for module in modules:
+        runs = [_import_times(module) for _ in range(repeat)]
+        best = min(runs, key=lambda t: t.get(module, 0))
+        results["modules"].append({"module": module, "import_ms": best.get(module, 0) / 1e3,
+                                   "median_ms": float(np.median([t.get(module, 0) for t in runs])) / 1e3})
+        children = sorted(((name, us) for name, us in best.items() if name != module), key=lambda item: -item[1])
+        results["heaviest"].extend({"module": module, "import": name, "import_ms": us / 1e3}
+                                   for name, us in children[:top])
+    return results
+
+
+def print_imports(results):
+    print(f"{'module':>10} {'best ms':>10} {'median ms':>10}")
+    for row in results["modules"]:
+        print(f"{row['module']:>10} {row['import_ms']:10.1f} {row['median_ms']:10.1f}")
+    print(f"{'module':>10} {'heaviest imports':>24} {'ms':>8}")
+    for row in results["heaviest"]:
+        print(f"{row['module']:>10} {row['import']:>24} {row['import_ms']:8.1f}")
+
+
+def bench_save_to_db(n=5000):
+    # the old path: one INSERT + commit per prediction on a default-journal DB
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "old.db")
+        conn = sqlite3.connect(old_path)
+        storage.migrate(conn, target=7)  # the sentiment_data table of the time
+        start = time.perf_counter()
+        for i in range(n):
+            conn.execute("INSERT INTO sentiment_data (username, text, prediction, confidence, timestamp) "
+                         "VALUES (?,?,?,?,?)", ("bench", f"post {i}", "Positive", 0.9,
+                                                datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        results.append({"writer": "commit_per_row", "rows_per_s": n / (time.perf_counter() - start)})
+        conn.close()
+
+        new_path = os.path.join(tmp, "new.db")
+        storage.create_main_tables(new_path)
+        start = time.perf_counter()
+        for i in range(n):
+            storage.save_to_db("bench", f"post {i}", "Positive", 0.9, db_path=new_path)
+        storage.get_writer(new_path).flush()
+        writer = storage.get_writer(new_path)
+        results.append({"writer": "write_behind", "rows_per_s": n / (time.perf_counter() - start),
+                        "commits": writer.commits})
+    return results
+
+
+def print_save_to_db(results):
+    print(f"{'writer':>16} {'rows/s':>12} {'commits':>8}")
+    for row in results:
+        print(f"{row['writer']:>16} {row['rows_per_s']:12.0f} {row.get('commits', '-'):>8}")
+
+
+def bench_reddit_ingest(n_sources=32, latency=0.05, limit=5):
+    # against the local fake Reddit, so only client-side overlap is measured
+    server = fake_reddit.FakeRedditServer(latency=latency).start()
+    try:
+        ingestor = reddit_ingest.RedditIngestor(oauth_url=server.url, reddit_url=server.url,
+                                               bucket=reddit_ingest.TokenBucket(rate=1000, capacity=100))
+        names = [f"user{i}" for i in range(n_sources)]
+        ingestor.fetch_redditor_posts("warmup", limit)  # token fetch
+
+        start = time.perf_counter()
+        for name in names:
+            ingestor.fetch_redditor_posts(name, limit)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ingestor.fetch_many(names, limit=limit)
+        concurrent = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    return [{"mode": "sequential", "sources": n_sources, "seconds": sequential},
+            {"mode": "concurrent", "sources": n_sources, "seconds": concurrent}]
+
+
+def print_reddit_ingest(results):
+    print(f"{'mode':>12} {'sources':>8} {'seconds':>9}")
+    for row in results:
+        print(f"{row['mode']:>12} {row['sources']:>8} {row['seconds']:9.2f}")
+
+
+def bench_microbatch(model, clients=32, requests_per_client=50, max_waits=(0.0, 0.005)):
+    # `clients` threads each send single-text requests back to back, either
+    # straight to the engine or through an inference.MicroBatcher (max_wait=0
+    # batches whatever queued up while the previous batch was scored)
+    scorer = inference.LinearScorer.from_pipeline(model)
+    posts = synthetic_posts(model, clients * requests_per_client, words_per_post=20, seed=3)
+    engines = {
+        "pipeline": lambda texts: inference.predict_batch(model, texts),
+        "linear_scorer": scorer.predict_batch,
+    }
+    results = []
+    for name, predict_fn in engines.items():
+        for max_wait in (None,) + tuple(max_waits):
+            batched = max_wait is not None
+            batcher = inference.MicroBatcher(predict_fn, max_wait=max_wait) if batched else None
+            call = batcher.predict if batched else (lambda text: predict_fn([text]))
+
+            def client(offset):
+                for text in posts[offset:offset + requests_per_client]:
+                    call(text)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(clients) as pool:
+                list(pool.map(client, range(0, len(posts), requests_per_client)))
+            elapsed = time.perf_counter() - start
+            row = {"engine": name, "max_wait_ms": max_wait * 1e3 if batched else None,
+                   "requests_per_s": len(posts) / elapsed}
+            if batched:
+                stats = batcher.stats()
+                row.update(mean_batch=stats["batch_sizes"]["mean"], queue_p50_ms=stats["queue_latency_p50"] * 1e3,
+                           queue_p99_ms=stats["queue_latency_p99"] * 1e3)
+            results.append(row)
+    return results
+
+
+def print_microbatch(results):
+    print(f"{'engine':>14} {'wait ms':>8} {'req/s':>10} {'mean batch':>11} {'queue p50 ms':>13} {'queue p99 ms':>13}")
+    for row in results:
+        batched = row["max_wait_ms"] is not None
+        wait = f"{row['max_wait_ms']:8.1f}" if batched else f"{'direct':>8}"
+        extra = (f"{row['mean_batch']:11.1f} {row['queue_p50_ms']:13.2f} {row['queue_p99_ms']:13.2f}"
+                 if batched else f"{'-':>11} {'-':>13} {'-':>13}")
+        print(f"{row['engine']:>14} {wait} {row['requests_per_s']:10.0f} {extra}")
+
+
+def bench_parallel(model, n=100000, max_workers=None, chunk_size=classify.CHUNK_SIZE):
+    # classify.py's process pool at 1..N workers (1 = in-process baseline)
+    posts = synthetic_posts(model, n, words_per_post=20, seed=4)
+    results = []
+    for workers in range(1, (max_workers or os.cpu_count() or 1) + 1):
+        start = time.perf_counter()
+        for _ in classify.classify_chunks(bulk.chunked(posts, chunk_size), workers):
+            pass
+        elapsed = time.perf_counter() - start
+        results.append({"workers": workers, "posts_per_s": n / elapsed})
+    for row in results:
+        row["speedup"] = row["posts_per_s"] / results[0]["posts_per_s"]
+    return results
+
+
+def print_parallel(results):
+    print(f"{'workers':>8} {'posts/s':>12} {'speedup':>8}")
+    for row in results:
+        print(f"{row['workers']:>8} {row['posts_per_s']:12.0f} {row['speedup']:7.2f}x")
+
+
+def run_on_app_db_copy(name, tmp):
+    # Runs benchmark `name` in a child process whose storage.DB_PATH is a
+    # copy of the app database, for benchmarks that drive ne.py (which
+    # migrates the database and saves rows) and so must not touch the real
+    # one. Returns the child's results.
+    db, out = os.path.join(tmp, "app.db"), os.path.join(tmp, f"{name}.json")
+    if os.path.exists(storage.DB_PATH):
+        with sqlite3.connect(storage.DB_PATH) as src, sqlite3.connect(db) as dst:
+            src.backup(dst)
+    subprocess.run([sys.executable, os.path.abspath(__file__), name, "--json", out], check=True,
+                   stdout=subprocess.DEVNULL, env={**os.environ, "SENTIMINDS_DB": db, APP_DB_COPY: "1"})
+    with open(out) as f:
+        return json.load(f)["results"][name]
+
+
+APP_DB_COPY = "SENTIMINDS_BENCH_APP_DB_COPY"  # set in run_on_app_db_copy's child
+
+
+def bench_page_assets(app_path="ne.py", pages=("login", "landing", "analysis"), reruns=5):
+    # Per-rerun cost of each page as Streamlit renders it: wall time and the
+    # bytes of markdown/HTML the rerun sends to the browser (inline base64
+    # images count here, URLs to app/static don't)
+    from streamlit.testing.v1 import AppTest
+
+    results = []
+    for page in pages:
+        at = AppTest.from_file(app_path, default_timeout=60)
+        at.session_state.page = page
+        at.session_state.logged_in = page != "login"
+        at.session_state.current_user = "bench"
+        at.run()
+        start = time.perf_counter()
+        for _ in range(reruns):
+            at.run()
+        elapsed = (time.perf_counter() - start) / reruns
+        sent = sum(len(m.value.encode("utf-8")) for m in at.markdown)
+        results.append({"page": page, "rerun_ms": elapsed * 1e3, "html_bytes": sent})
+    return results
+
+
+def print_page_assets(results):
+    print(f"{'page':>10} {'rerun ms':>10} {'HTML bytes/rerun':>18}")
+    for row in results:
+        print(f"{row['page']:>10} {row['rerun_ms']:10.1f} {row['html_bytes']:18,}")
+
+
+def _fragment_ids(at):
+    # {function name: fragment id} of the fragments registered by the last run
+    ids = {}
+    for fragment_id, wrapped in at._fragment_storage._fragments.items():
+        for cell in wrapped.__closure__ or ():
+            if callable(cell.cell_contents) and cell.cell_contents.__name__ != "wrapped_fragment":
+                ids[cell.cell_contents.__name__] = fragment_id
+    return ids
+
+
+def _interaction_cpu(at, act, fragment_id=None):
+    # (script CPU, process CPU, wall) ms of the rerun `act` triggers. Script
+    # CPU is the script thread's own, what the server spends running the
+    # page; process CPU adds AppTest's bookkeeping and the batcher thread.
+    # AppTest always reruns the whole script; a browser reruns only the
+    # fragment holding the widget, which is emulated by tagging the rerun
+    # request with the fragment id, as the frontend does.
+    from streamlit.testing.v1 import local_script_runner
+
+    runner, rerun_data = local_script_runner.LocalScriptRunner, local_script_runner.RerunData
+    run_script, script_cpu = runner._run_script, []
+
+    def timed_run_script(self, data):
+        start = time.thread_time()
+        try:
+            return run_script(self, data)
+        finally:
+            script_cpu.append(time.thread_time() - start)
+
+    runner._run_script = timed_run_script
+    if fragment_id:
+        local_script_runner.RerunData = functools.partial(rerun_data, fragment_id=fragment_id)
+    try:
+        cpu, wall = time.process_time(), time.perf_counter()
+        act()
+        return sum(script_cpu) * 1e3, (time.process_time() - cpu) * 1e3, (time.perf_counter() - wall) * 1e3
+    finally:
+        runner._run_script = run_script
+        local_script_runner.RerunData = rerun_data
+
+
+def bench_interactions(app_path="ne.py", repeat=10):
+    # Server CPU per interaction on the analysis page, for a full-page rerun
+    # and, where the widget sits in an st.fragment, a fragment rerun. The
+    # "Analyze" clicks save rows as user "bench", deleted afterwards. Run it
+    # through run_on_app_db_copy, as bench.py does, to leave senti.db alone.
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import AppTest, local_script_runner
+
+    def analyze(at):
+        at.text_input[0].input(f"I absolutely love this app {random.random()}")
+        next(b for b in at.button if "Analyze" in b.label).click().run()
+
+    def regroup(at):
+        box = at.selectbox(key="records_bucket")
+        box.select("day" if box.value == "hour" else "hour").run()
+
+    def export_format(at):
+        box = at.selectbox(key="export_format")
+        box.select("csv.gz" if box.value == "csv" else "csv").run()
+
+    interactions = (("analyze_text", "bench", "analysis_section", analyze),
+                    ("records_regroup", "tena", "records_section", regroup),
+                    ("export_format", "tena", "export_section", export_format))
+    results = []
+    # AppTest recompiles the script every run; a server compiles it once
+    shared_cache, script_cache = ScriptCache(), local_script_runner.ScriptCache
+    local_script_runner.ScriptCache = lambda: shared_cache
+    try:
+        for name, user, fragment, act in interactions:
+            at = AppTest.from_file(app_path, default_timeout=60)
+            at.session_state.page = "analysis"
+            at.session_state.logged_in = True
+            at.session_state.current_user = user
+            at.session_state.show_records = True
+            at.run()
+            act(at)  # warm caches and lazy imports
+            fragment_id = _fragment_ids(at).get(fragment)
+            for scope, fid in (("full", None), ("fragment", fragment_id)):
+                if scope == "fragment" and fid is None:
+                    continue  # app without fragments
+                timings = [_interaction_cpu(at, lambda: act(at), fid) for _ in range(repeat)]
+                if at.exception:
+                    raise RuntimeError(f"{name}: {at.exception[0].message}")
+                script_ms, process_ms, wall_ms = np.median(timings, axis=0)
+                results.append({"interaction": name, "rerun": scope, "script_cpu_ms": float(script_ms),
+                                "process_cpu_ms": float(process_ms), "wall_ms": float(wall_ms)})
+    finally:
+        local_script_runner.ScriptCache = script_cache
+        storage.flush_writes()
+        with storage.connection() as conn:
+            with conn:
+                conn.execute("DELETE FROM predictions WHERE username = 'bench'")
+        storage.prune_texts()
+    return results
+
+
+def print_interactions(results):
+    print(f"{'interaction':>16} {'rerun':>9} {'script CPU ms':>14} {'process CPU ms':>15} {'wall ms':>8}")
+    for row in results:
+        print(f"{row['interaction']:>16} {row['rerun']:>9} {row['script_cpu_ms']:14.1f} "
+              f"{row['process_cpu_ms']:15.1f} {row['wall_ms']:8.1f}")
+
+
+def bench_admin_queries(db_paths):
+    # db_paths: {rows: path to a synthetic_sentiment_db}. Times what the
+    # admin records view runs per rerun, plus the full-scan aggregates the
+    # rollups replace.
+    results = []
+    for n, path in sorted(db_paths.items()):
+        _, cursor = storage.query_sentiment(limit=50 * 20, db_path=path)
+        queries = {
+            "first_page": lambda: storage.query_sentiment(limit=50, db_path=path),
+            "page_21": lambda: storage.query_sentiment(after=cursor, limit=50, db_path=path),
+            "user_month_page": lambda: storage.query_sentiment("user7", "2025-03-01", "2025-04-01", limit=50,
+                                                               db_path=path),
+            "counts_rollup": lambda: storage.sentiment_counts(db_path=path),
+            "counts_scan": lambda: storage._scan_counts(db_path=path),
+            "over_time_hour_rollup": lambda: storage.sentiment_over_time("hour", db_path=path),
+            "over_time_hour_scan": lambda: storage._scan_over_time("hour", db_path=path),
+            "user_month_counts": lambda: storage.sentiment_counts("user7", "2025-03-01", "2025-04-01", db_path=path),
+        }
+        for name, query in queries.items():
+            results.append({"rows": n, "query": name, "best_ms": _timed(query) * 1e3})
+    return results
+
+
+def print_admin_queries(results):
+    print(f"{'rows':>9} {'query':>22} {'best ms':>10}")
+    for row in results:
+        print(f"{row['rows']:>9} {row['query']:>22} {row['best_ms']:10.2f}")
+
+
+def bench_search(db_paths):
+    # Keyword searches through the FTS5 index, one page of 50 each, against
+    # the LIKE scan they replace
+    results = []
+    for n, path in sorted(db_paths.items()):
+        _, cursor = storage.search_sentiment(RARE_WORD, limit=50, db_path=path)
+        queries = {
+            "rare_word": lambda: storage.search_sentiment(RARE_WORD, db_path=path),
+            "rare_word_page_2": lambda: storage.search_sentiment(RARE_WORD, after=cursor, db_path=path),
+            "rare_word_like_scan": lambda: _like_scan(RARE_WORD, path),
+            "common_word": lambda: storage.search_sentiment("love", db_path=path),
+            "two_words_negative": lambda: storage.search_sentiment("love movie", "Negative", db_path=path),
+            "prefix": lambda: storage.search_sentiment("ref*", db_path=path),
+            "word_user_month": lambda: storage.search_sentiment("love", None, "user7", "2025-03-01", "2025-04-01",
+                                                                db_path=path),
+            "rare_word_user_month": lambda: storage.search_sentiment(RARE_WORD, "Negative", "user7", "2025-03-01",
+                                                                     "2025-04-01", db_path=path),
+        }
+        for name, query in queries.items():
+            results.append({"rows": n, "query": name, "best_ms": _timed(query) * 1e3})
+    return results
+
+
+def _like_scan(word, path, limit=50):
+    with storage.connection(path) as conn:
+        return conn.execute("SELECT * FROM sentiment_data WHERE text LIKE ? ORDER BY id DESC LIMIT ?",
+                            (f"%{word}%", limit)).fetchall()
+
+
+def print_search(results):
+    print(f"{'rows':>9} {'query':>22} {'best ms':>10}")
+    for row in results:
+        print(f"{row['rows']:>9} {row['query']:>22} {row['best_ms']:10.2f}")
+
+
+def bench_export(db_paths, formats=("csv", "csv.gz")):
+    results = []
+    for n, path in sorted(db_paths.items()):
+        for fmt in formats:
+            with tempfile.TemporaryFile() as out:
+                start = time.perf_counter()
+                written = export.write_export(out, fmt, db_path=path)
+                elapsed = time.perf_counter() - start
+                size = out.tell()
+            results.append({"rows": n, "format": fmt, "seconds": elapsed, "rows_per_s": written / elapsed,
+                            "out_bytes": size})
+    return results
+
+
+def print_export(results):
+    print(f"{'rows':>9} {'format':>7} {'seconds':>9} {'rows/s':>12} {'MB':>8}")
+    for row in results:
+        print(f"{row['rows']:>9} {row['format']:>7} {row['seconds']:9.2f} {row['rows_per_s']:12.0f} "
+              f"{row['out_bytes'] / 1e6:8.1f}")
+
+
+def bench_storage(sizes, tmp, repeat_shares=(0.0, 0.5)):
+    # A database in the layout before migration 8 converted online: file
+    # size before and after (both vacuumed), the migration step the app
+    # runs at startup, and compact.py's rate. repeat_share is the share of
+    # rows re-analyzing an already stored text.
+    results = []
+    for n in sizes:
+        for share in repeat_shares:
+            path = synthetic_legacy_db(os.path.join(tmp, f"legacy_{n}_{share}.db"), n, repeat_share=share)
+            legacy_bytes = os.path.getsize(path)
+            start = time.perf_counter()
+            storage.create_main_tables(path)
+            migrate = time.perf_counter() - start
+            start = time.perf_counter()
+            moved = compact.run_compaction(path)
+            convert = time.perf_counter() - start
+            storage.vacuum(path)
+            results.append({"rows": n, "repeat_share": share, "legacy_bytes": legacy_bytes,
+                            "compact_bytes": os.path.getsize(path), "migrate_ms": migrate * 1e3,
+                            "convert_rows_per_s": moved / convert if moved else None})
+    return results
+
+
+def print_storage(results):
+    print(f"{'rows':>9} {'repeats':>8} {'legacy MB':>10} {'compact MB':>11} {'ratio':>6} {'migrate ms':>11} "
+          f"{'convert rows/s':>15}")
+    for row in results:
+        rate = row["convert_rows_per_s"]
+        rate = f"{rate:15.0f}" if rate is not None else f"{'-':>15}"
+        print(f"{row['rows']:>9} {row['repeat_share']:8.0%} {row['legacy_bytes'] / 1e6:10.1f} "
+              f"{row['compact_bytes'] / 1e6:11.1f} {row['compact_bytes'] / row['legacy_bytes']:6.2f} "
+              f"{row['migrate_ms']:11.1f} {rate}")
+
+
+def bench_wordcloud(model, sizes=(10, 100, 1000)):
+    # the Reddit path's two clouds: word counting, a cold render (fresh
+    # image cache) and the same clouds again (cache hit)
+    scorer = inference.LinearScorer.from_pipeline(model)
+    wordclouds.render_cloud({"warmup": 1}.items(), "Greens", cache=wordclouds.ImageCache())  # imports
+    results = []
+    for size in sizes:
+        posts = synthetic_posts(model, size, seed=5)
+        pos, neg = posts[:size // 2], posts[size // 2:]
+        count = _timed(lambda: (wordclouds.word_frequencies(pos, scorer.tokens),
+                                wordclouds.word_frequencies(neg, scorer.tokens)))
+        cache = wordclouds.ImageCache()
+
+        def render():
+            return [wordclouds.render_cloud(wordclouds.word_frequencies(texts, scorer.tokens), colormap, cache=cache)
+                    for texts, colormap in ((pos, "Greens"), (neg, "Reds"))]
+
+        start = time.perf_counter()
+        render()
+        cold = time.perf_counter() - start
+        cached = _timed(render)
+        results.append({"posts": size, "count_ms": count * 1e3, "cold_ms": cold * 1e3, "cached_ms": cached * 1e3})
+    return results
+
+
+def print_wordcloud(results):
+    print(f"{'posts':>7} {'count ms':>10} {'cold ms':>10} {'cached ms':>10}")
+    for row in results:
+        print(f"{row['posts']:>7} {row['count_ms']:10.2f} {row['cold_ms']:10.1f} {row['cached_ms']:10.2f}")
+
+
+# ----------------------------
+# RESULTS FILES
+# ----------------------------
+def run_metadata():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "model_version": inference.model_version()}
+
+
+# metric keys by suffix: True when higher is better
+_DIRECTIONS = {"_per_s": True, "speedup": True, "_ms": False, "_us": False, "seconds": False, "_bytes": False,
+               "commits": False}
+
+
+def _direction(key):
+    for suffix, higher_is_better in _DIRECTIONS.items():
+        if key.endswith(suffix):
+            return higher_is_better
+    return None
+
+
+def compare_results(old, new, threshold=0.10):
+    # Matches rows of two results files by their non-metric fields and
+    # returns [(benchmark, row id, metric, old, new, change, regressed)]
+    # where change > 0 means better
+    def tables(results):
+        # {name: rows}, with nested results such as scorer's flattened
+        for name, value in results.items():
+            if isinstance(value, dict):
+                yield from ((f"{name}.{sub}", rows) for sub, rows in value.items() if isinstance(rows, list))
+            elif isinstance(value, list):
+                yield name, value
+
+    report = []
+    old_tables = dict(tables(old["results"]))
+    for name, new_rows in tables(new["results"]):
+        old_rows = old_tables.get(name)
+        if old_rows is None:
+            continue
+
+        def row_id(row):
+            return tuple((k, v) for k, v in row.items() if _direction(k) is None)
+
+        old_by_id = {row_id(row): row for row in old_rows}
+        for row in new_rows:
+            before = old_by_id.get(row_id(row))
+            if before is None:
+                continue
+            for key, value in row.items():
+                higher_is_better = _direction(key)
+                if higher_is_better is None or not before.get(key) or value is None:
+                    continue
+                change = (value / before[key] - 1) if higher_is_better else (before[key] / value - 1)
+                report.append((name, dict(row_id(row)), key, before[key], value, change, change < -threshold))
+    return report
+
+
+def print_comparison(report):
+    print(f"{'benchmark':>12} {'metric':>22} {'old':>12} {'new':>12} {'change':>8}  row")
+    for name, row, key, before, after, change, regressed in report:
+        flag = "  REGRESSION" if regressed else ""
+        ident = " ".join(f"{k}={v}" for k, v in row.items())
+        print(f"{name:>12} {key:>22} {before:12.4g} {after:12.4g} {change:+7.1%}  {ident}{flag}")
+
+
+BENCHMARKS = ["batch", "scorer", "startup", "imports", "save", "reddit", "microbatch", "parallel", "assets",
+              "interactions", "admin", "search", "export", "storage", "wordcloud"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiminds performance benchmarks (offline)")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help=f"any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--model", default=inference.MODEL_PATH)
+    parser.add_argument("--max-workers", type=int, help="parallel: highest worker count (default: all cores)")
+    parser.add_argument("--rows", default="10000,1000000", help="admin/search/export/storage: synthetic table sizes")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two --json files instead of running benchmarks")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    args.benchmarks = args.benchmarks or BENCHMARKS
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            report = compare_results(json.load(f_old), json.load(f_new))
+        print_comparison(report)
+        sys.exit(1 if any(r[-1] for r in report) else 0)
+
+    model = inference.load_model(args.model)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_paths = {}
+        if {"admin", "search", "export"} & set(args.benchmarks):
+            for n in (int(r) for r in args.rows.split(",")):
+                db_paths[n] = synthetic_sentiment_db(os.path.join(tmp, f"bench_{n}.db"), n)
+
+        runs = {
+            "batch": (lambda: bench_batch_predict(model), print_batch_predict),
+            "scorer": (lambda: {"parity": check_scorer_parity(model), "latency": bench_single_latency(model)},
+                       lambda r: (print(f"LinearScorer parity OK on {r['parity']['texts']} texts "
+                                        f"(max diff {r['parity']['max_score_diff']:.2e})"),
+                                  print_single_latency(r["latency"]))),
+            "startup": (lambda: bench_startup(args.model), print_startup),
+            "imports": (bench_imports, print_imports),
+            "save": (bench_save_to_db, print_save_to_db),
+            "reddit": (bench_reddit_ingest, print_reddit_ingest),
+            "microbatch": (lambda: bench_microbatch(model), print_microbatch),
+            "parallel": (lambda: bench_parallel(model, max_workers=args.max_workers), print_parallel),
+            "assets": (lambda: bench_page_assets() if os.environ.get(APP_DB_COPY)
+                       else run_on_app_db_copy("assets", tmp), print_page_assets),
+            "interactions": (lambda: bench_interactions() if os.environ.get(APP_DB_COPY)
+                             else run_on_app_db_copy("interactions", tmp), print_interactions),
+            "admin": (lambda: bench_admin_queries(db_paths), print_admin_queries),
+            "search": (lambda: bench_search(db_paths), print_search),
+            "export": (lambda: bench_export(db_paths), print_export),
+            "storage": (lambda: bench_storage(sorted(int(r) for r in args.rows.split(",")), tmp), print_storage),
+            "wordcloud": (lambda: bench_wordcloud(model), print_wordcloud),
+        }
+        for name in BENCHMARKS:
+            if name in args.benchmarks:
+                bench, show = runs[name]
+                print(f"== {name}")
+                results[name] = bench()
+                show(results[name])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": run_metadata(), "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
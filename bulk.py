@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+
+import inference
+import storage
+
+# ----------------------------
+# BULK CLASSIFICATION
+# ----------------------------
+# A generator pipeline: file -> texts -> fixed-size chunks -> scored chunks
+# -> one INSERT transaction per chunk. Only the current chunk is held in
+# memory, whatever the number of rows.
+CHUNK_SIZE = 1000
+FORMATS = ("csv", "jsonl", "txt")
+TEXT_FIELDS = ("text", "body", "review", "content", "comment")  # tried in order when no field is given
+
+
+def detect_format(filename):
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    if ext == "ndjson":
+        return "jsonl"
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported file type: .{ext} (use CSV, JSONL or TXT)")
+    return ext
+
+
+def _pick_field(keys, text_field):
+    if text_field:
+        if text_field not in keys:
+            raise ValueError(f'No "{text_field}" column in the uploaded file')
+        return text_field
+    for field in TEXT_FIELDS:
+        if field in keys:
+            return field
+    raise ValueError(f"Could not find a text column; expected one of {', '.join(TEXT_FIELDS)}")
+
+
+def iter_texts(fileobj, fmt, text_field=None, stats=None):
+    # fileobj is a binary file; yields one non-empty text per row/line.
+    # CSV rows and JSONL records without text in the chosen field are
+    # counted in stats["skipped"] when a stats dict is given. Unreadable
+    # input raises ValueError naming the line.
+    # utf-8-sig drops the BOM Excel puts before the first header
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", errors="replace", newline="")
+    stats = {} if stats is None else stats
+    stats.setdefault("skipped", 0)
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            try:
+                field = _pick_field(reader.fieldnames or [], text_field)
+                for row in reader:
+                    if row.get(field):
+                        yield row[field]
+                    else:
+                        stats["skipped"] += 1
+            except csv.Error as e:
+                raise ValueError(f"line {reader.line_num + 1}: {e}") from None
+        elif fmt == "jsonl":
+            field = text_field
+            for n, line in enumerate(text, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"line {n}: invalid JSON ({e})") from None
+                if isinstance(record, str):
+                    value = record
+                elif isinstance(record, dict):
+                    field = field or _pick_field(record.keys(), None)
+                    value = record.get(field)
+                else:
+                    raise ValueError(f"line {n}: expected a JSON object or string, got {type(record).__name__}")
+                if isinstance(value, str) and value.strip():
+                    yield value
+                else:
+                    stats["skipped"] += 1
+        elif fmt == "txt":
+            for line in text:
+                if line.strip():
+                    yield line.rstrip("\r\n")
+        else:
+            raise ValueError(f"Unknown format: {fmt}")
+    finally:
+        text.detach()  # don't close the caller's file
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def classify_chunks(chunks, scorer, calibrator=None):
+    # yields (texts, predictions, scores, confidences) per chunk
+    for texts in chunks:
+        predictions, scores = scorer.predict_batch(texts)
+        yield texts, predictions, scores, inference.confidence_scores(scores, calibrator)
+
+
+def run_bulk(fileobj, fmt, scorer, calibrator=None, username="anonymous", text_field=None,
+             chunk_size=CHUNK_SIZE, save=True, on_chunk=None, db_path=storage.DB_PATH):
+    # Classifies every row of `fileobj` and stores it in sentiment_data with
+    # the Reddit path's bare labels. on_chunk(summary, texts, predictions) is
+    # called after each chunk, e.g. to update a progress bar. Returns the
+    # summary {"rows", "Positive", "Negative", "skipped"}, skipped counting
+    # records with no text in the chosen field.
+    summary = {"rows": 0, "Positive": 0, "Negative": 0, "skipped": 0}
+    chunks = chunked(iter_texts(fileobj, fmt, text_field, summary), chunk_size)
+    for texts, predictions, scores, confidences in classify_chunks(chunks, scorer, calibrator):
+        labels = [inference.sentiment_label(p) for p in predictions]
+        if save:
+            timestamp = int(time.time())
+            storage.insert_sentiment_rows(
+                [(username, t, label, float(c), timestamp, float(s), scorer.version)
+                 for t, label, s, c in zip(texts, labels, scores, confidences)],
+                db_path)
+        positives = int((predictions == 1).sum())
+        summary["rows"] += len(texts)
+        summary["Positive"] += positives
+        summary["Negative"] += len(texts) - positives
+        if on_chunk is not None:
+            on_chunk(summary, texts, labels)
+    return summary
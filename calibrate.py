@@ -0,0 +1,54 @@
+import argparse
+import csv
+
+import numpy as np
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+
+import inference
+
+# ----------------------------
+# OFFLINE CALIBRATION
+# ----------------------------
+# Usage: python calibrate.py labeled.csv [--method platt|isotonic]
+# The CSV needs a "text" column and a "label" column holding 1/0 or
+# Positive/Negative. The fitted calibrator is written next to the model.
+
+
+def read_labeled_csv(path):
+    texts, labels = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            label = row["label"].strip()
+            texts.append(row["text"])
+            labels.append(1 if label in ("1", "Positive", "positive") else 0)
+    return texts, np.array(labels)
+
+
+def fit_calibrator(scores, labels, method="platt"):
+    if method == "platt":
+        lr = LogisticRegression()
+        lr.fit(scores.reshape(-1, 1), labels)
+        return {"method": "platt", "coef": float(lr.coef_[0][0]), "intercept": float(lr.intercept_[0])}
+    if method == "isotonic":
+        iso = IsotonicRegression(out_of_bounds="clip", y_min=0.0, y_max=1.0)
+        iso.fit(scores, labels)
+        return {"method": "isotonic", "x": iso.X_thresholds_.tolist(), "y": iso.y_thresholds_.tolist()}
+    raise ValueError(f"Unknown calibration method: {method}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit a confidence calibrator for the sentiment model")
+    parser.add_argument("csv_path")
+    parser.add_argument("--method", choices=["platt", "isotonic"], default="platt")
+    parser.add_argument("--model", default=inference.MODEL_PATH)
+    parser.add_argument("--out", default=inference.CALIBRATION_PATH)
+    args = parser.parse_args()
+
+    model = inference.load_model(args.model)
+    texts, labels = read_labeled_csv(args.csv_path)
+    _, scores = inference.predict_batch(model, texts)
+
+    calibrator = fit_calibrator(scores, labels, args.method)
+    inference.save_calibrator(calibrator, args.out)
+    print(f"Saved {args.method} calibrator fitted on {len(texts)} texts to {args.out}")
@@ -0,0 +1,152 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import bulk
+import inference
+import storage
+
+# ----------------------------
+# PARALLEL OFFLINE CLASSIFICATION
+# ----------------------------
+# Usage: python classify.py INPUT [--out results.csv | --db senti.db --user NAME] [--workers N]
+# Shards the input into chunks scored by a process pool. Each worker loads
+# the scorer once, from the mmap artifact written by export_model.py, so
+# the weight and idf arrays are shared through the page cache instead of a
+# pickled model per worker. Results come back in input order and are
+# appended chunk by chunk; at most `workers * IN_FLIGHT_PER_WORKER` chunks
+# are held in memory at a time.
+CHUNK_SIZE = 5000
+IN_FLIGHT_PER_WORKER = 2
+OUTPUT_FORMATS = ("csv", "jsonl")
+
+_scorer = None
+
+
+def _init_worker(model_path, artifact_dir):
+    global _scorer
+    _scorer = inference.load_scorer(model_path, artifact_dir)
+
+
+def _score_chunk(texts):
+    predictions, scores = _scorer.predict_batch(texts)
+    return predictions, scores
+
+
+def classify_chunks(chunks, workers=None, model_path=inference.MODEL_PATH, artifact_dir=inference.ARTIFACT_DIR):
+    # yields (texts, predictions, scores) per chunk, in input order
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        # no pool: the single-core baseline, without IPC overhead
+        _init_worker(model_path, artifact_dir)
+        for texts in chunks:
+            yield (texts, *_score_chunk(texts))
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path, artifact_dir)) as pool:
+        pending = deque()
+        for texts in chunks:
+            pending.append((texts, pool.submit(_score_chunk, texts)))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                texts, future = pending.popleft()
+                yield (texts, *future.result())
+        while pending:
+            texts, future = pending.popleft()
+            yield (texts, *future.result())
+
+
+# ----------------------------
+# SINKS
+# ----------------------------
+class FileSink:
+    # append-only CSV/JSONL of text, label, score, confidence
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file) if fmt == "csv" else None
+        if new and self.writer:
+            self.writer.writerow(["text", "label", "score", "confidence"])
+
+    def write(self, rows):
+        if self.writer:
+            self.writer.writerows(rows)
+        else:
+            self.file.writelines(
+                json.dumps({"text": t, "label": l, "score": s, "confidence": c}) + "\n" for t, l, s, c in rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class DatabaseSink:
+    # sentiment_data rows, one transaction per chunk
+    def __init__(self, db_path, username, model_version=None):
+        self.db_path = db_path
+        self.username = username
+        self.model_version = model_version or inference.model_version()
+        storage.create_main_tables(db_path)
+
+    def write(self, rows):
+        timestamp = int(time.time())
+        storage.insert_sentiment_rows([(self.username, t, l, c, timestamp, s, self.model_version)
+                                       for t, l, s, c in rows], self.db_path)
+
+    def close(self):
+        pass
+
+
+def run(input_path, sink, workers=None, chunk_size=CHUNK_SIZE, text_field=None, progress=None, stats=None):
+    # Returns (rows, seconds). progress(rows) is called after each chunk;
+    # stats["skipped"] counts records with no text (see bulk.iter_texts).
+    calibrator = inference.load_calibrator()
+    rows, start = 0, time.perf_counter()
+    with open(input_path, "rb") as f:
+        chunks = bulk.chunked(bulk.iter_texts(f, bulk.detect_format(input_path), text_field, stats), chunk_size)
+        for texts, predictions, scores in classify_chunks(chunks, workers):
+            confidences = inference.confidence_scores(scores, calibrator)
+            sink.write([(t, inference.sentiment_label(p), float(s), float(c))
+                        for t, p, s, c in zip(texts, predictions, scores, confidences)])
+            rows += len(texts)
+            if progress is not None:
+                progress(rows)
+    return rows, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify a large CSV/JSONL/TXT file on all cores")
+    parser.add_argument("input")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="append results to this .csv or .jsonl file")
+    target.add_argument("--db", help="insert results into this SQLite database's sentiment_data")
+    parser.add_argument("--user", default="batch", help="username stored with --db rows")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--text-field", help="CSV column / JSONL key holding the text")
+    args = parser.parse_args()
+
+    if args.out:
+        fmt = os.path.splitext(args.out)[1].lstrip(".").lower()
+        if fmt not in OUTPUT_FORMATS:
+            parser.error("--out must end in .csv or .jsonl")
+        sink = FileSink(args.out, fmt)
+    else:
+        sink = DatabaseSink(args.db, args.user)
+    stats = {}
+    try:
+        n, seconds = run(args.input, sink, args.workers, args.chunk_size, args.text_field,
+                         progress=lambda rows: print(f"\r{rows:,} rows", end="", file=sys.stderr), stats=stats)
+    except ValueError as e:
+        sys.exit(f"\nCould not read {args.input}: {e}")
+    finally:
+        sink.close()
+    print(f"\nClassified {n:,} rows in {seconds:.1f}s ({n / max(seconds, 1e-9):,.0f} rows/s, "
+          f"{args.workers} workers)", file=sys.stderr)
+    if stats["skipped"]:
+        print(f"Skipped {stats['skipped']:,} rows with no text in the chosen field", file=sys.stderr)
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+import storage
+
+# ----------------------------
+# STORAGE COMPACTION
+# ----------------------------
+# Usage: python compact.py [--db senti.db] [--chunk-size 2000] [--pause 0] [--status] [--prune] [--vacuum]
+# Moves the rows of a database written before the compact layout (see
+# storage.py, COMPACT STORAGE) from sentiment_legacy into texts and
+# predictions, newest first, and drops the old table once it is empty.
+# Each chunk is one short write transaction, so the live app keeps
+# writing and reading throughout; --pause adds a sleep between chunks to
+# leave it more headroom. Safe to stop at any time and run again.
+# Freed pages are reused for new rows; --vacuum also gives them back to
+# the filesystem, but blocks writers while it rewrites the file.
+
+
+def run_compaction(db_path=storage.DB_PATH, chunk_size=storage.COMPACT_CHUNK_ROWS, pause=0.0, progress=None):
+    # Returns the number of rows moved. progress(done) is called after
+    # each committed chunk.
+    storage.create_main_tables(db_path)
+    done = 0
+    while True:
+        moved = storage.compact_legacy_chunk(chunk_size, db_path)
+        if not moved:
+            return done
+        done += moved
+        if progress is not None:
+            progress(done)
+        if pause:
+            time.sleep(pause)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert sentiment_data rows to the compact storage layout")
+    parser.add_argument("--db", default=storage.DB_PATH)
+    parser.add_argument("--chunk-size", type=int, default=storage.COMPACT_CHUNK_ROWS)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+    parser.add_argument("--status", action="store_true", help="only report how many rows are left")
+    parser.add_argument("--prune", action="store_true", help="also delete texts no prediction refers to")
+    parser.add_argument("--vacuum", action="store_true", help="also shrink the file (blocks writers meanwhile)")
+    args = parser.parse_args()
+
+    storage.create_main_tables(args.db)
+    total = storage.count_legacy_rows(args.db)
+    if args.status:
+        print(f"{total:,} rows to convert")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    n = run_compaction(args.db, args.chunk_size, args.pause,
+                       progress=lambda done: print(f"\r{done:,}/{total:,} rows", end="", file=sys.stderr))
+    print(f"\nConverted {n:,} rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if args.prune:
+        print(f"Deleted {storage.prune_texts(args.db):,} unreferenced texts", file=sys.stderr)
+    if args.vacuum:
+        size = os.path.getsize(args.db)
+        storage.vacuum(args.db)
+        print(f"Vacuumed {size:,} -> {os.path.getsize(args.db):,} bytes", file=sys.stderr)
@@ -0,0 +1,92 @@
+import argparse
+import csv
+import gzip
+import importlib.util
+import io
+
+import storage
+
+# ----------------------------
+# STREAMING EXPORT
+# ----------------------------
+# Usage: python export.py out.csv.gz [--format csv.gz] [--user tena] [--start 2025-11-01] [--end 2025-12-01]
+# Rows are read from sentiment_data in keyset chunks and written as they
+# arrive, so memory stays at one chunk whatever the table size.
+FORMATS = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",  # only with pyarrow installed (optional)
+}
+
+
+def available_formats():
+    # FORMATS usable in this environment; checked without importing pyarrow
+    return [fmt for fmt in FORMATS if fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+
+def write_csv(out, chunks):
+    # out is a binary file object
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(storage.SENTIMENT_COLUMNS)
+    rows = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        rows += len(chunk)
+    text.flush()
+    text.detach()  # leave `out` open for the caller
+    return rows
+
+
+def write_parquet(out, chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("username", pa.string()), ("text", pa.string()),
+        ("prediction", pa.string()), ("confidence", pa.float64()), ("timestamp", pa.string()),
+    ])
+    rows = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.record_batch([pa.array(c, type=f.type) for c, f in zip(columns, schema)],
+                                               schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def write_export(out, fmt="csv", username=None, start=None, end=None, chunk_size=5000, db_path=storage.DB_PATH,
+                 flush_timeout=storage.FLUSH_TIMEOUT):
+    # Writes the filtered table to the binary file object `out` and returns
+    # the number of rows written. Predictions still queued in this process
+    # are included if they can be committed within flush_timeout seconds.
+    storage.flush_writes(flush_timeout)
+    chunks = storage.iter_sentiment_chunks(username, start, end, chunk_size=chunk_size, db_path=db_path)
+    if fmt == "csv":
+        return write_csv(out, chunks)
+    if fmt == "csv.gz":
+        with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+            return write_csv(gz, chunks)
+    if fmt == "parquet":
+        return write_parquet(out, chunks)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export sentiment_data without loading it into memory")
+    parser.add_argument("out")
+    parser.add_argument("--format", choices=available_formats(), default="csv")
+    parser.add_argument("--user")
+    parser.add_argument("--start", help="inclusive, YYYY-MM-DD[ HH:MM:SS]")
+    parser.add_argument("--end", help="exclusive, YYYY-MM-DD[ HH:MM:SS]")
+    parser.add_argument("--db", default=storage.DB_PATH)
+    args = parser.parse_args()
+
+    storage.create_main_tables(args.db)
+    with open(args.out, "wb") as f:
+        n = write_export(f, args.format, args.user, args.start, args.end, db_path=args.db)
+    print(f"Exported {n} rows to {args.out}")
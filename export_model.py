@@ -0,0 +1,22 @@
+import argparse
+
+import inference
+
+# ----------------------------
+# MODEL EXPORT
+# ----------------------------
+# Usage: python export_model.py
+# Converts the pickled pipeline into the mmap-friendly LinearScorer artifact
+# that the app loads at startup. Re-run it whenever the pickle is replaced;
+# until then the app detects the stale artifact and unpickles the model.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the sentiment model to an mmap-friendly artifact")
+    parser.add_argument("--model", default=inference.MODEL_PATH)
+    parser.add_argument("--out", default=inference.ARTIFACT_DIR)
+    args = parser.parse_args()
+
+    scorer = inference.LinearScorer.from_pipeline(inference.load_model(args.model))
+    version = inference.model_version(args.model)
+    scorer.save(args.out, source_version=version)
+    print(f"Exported {len(scorer.vocabulary)} features from {args.model} (version {version}) to {args.out}")
@@ -0,0 +1,135 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ----------------------------
+# FAKE REDDIT (offline stand-in)
+# ----------------------------
+# Serves the handful of Reddit endpoints the app uses, with x-ratelimit-*
+# headers and optional latency, so ingestion can be exercised and
+# benchmarked without network access:
+#   ingestor = RedditIngestor(oauth_url=server.url, reddit_url=server.url)
+# Every user and subreddit exists and has `posts_per_source` submissions
+# with ids counting down from newest to oldest, less any ids added to
+# `deleted`.
+_LISTING = re.compile(r"^/(?:user|u)/([^/]+)/submitted/?$|^/r/([^/]+)/new/?$")
+WORDS = ("good great love happy awesome nice bad awful hate sad terrible boring "
+         "movie game phone food weather team music book day work").split()
+
+
+class FakeRedditServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, quota=100000, window=600, posts_per_source=25, seed=0):
+        super().__init__(("127.0.0.1", port), FakeRedditHandler)
+        self.latency = latency
+        self.quota = quota
+        self.window = window
+        self.posts_per_source = posts_per_source
+        self.seed = seed
+        self.deleted = set()  # ids of removed submissions, left out of listings
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.started = time.time()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def rate_limit_headers(self):
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.window:
+                self.window_start, self.requests = now, 0
+            self.requests += 1
+            reset = int(self.window - (now - self.window_start))
+            return {
+                "x-ratelimit-used": str(self.requests),
+                "x-ratelimit-remaining": str(float(max(0, self.quota - self.requests))),
+                "x-ratelimit-reset": str(reset),
+            }
+
+    def submissions(self, source):
+        # deterministic per source, newest first; ids are zero-padded counters
+        # (post i was created i hours after the server started, so raising
+        # posts_per_source simulates new submissions)
+        source = source.lower()
+        posts = []
+        for i in range(self.posts_per_source, 0, -1):
+            if f"{source[:3]}{i:06d}" in self.deleted:
+                continue
+            rng = random.Random(f"{self.seed}:{source}:{i}")
+            posts.append({
+                "id": f"{source[:3]}{i:06d}",
+                "name": f"t3_{source[:3]}{i:06d}",
+                "title": " ".join(rng.choices(WORDS, k=6)),
+                "selftext": " ".join(rng.choices(WORDS, k=rng.randint(0, 30))),
+                "created_utc": float(int(self.started) + i * 3600),
+            })
+        return posts
+
+
+class FakeRedditHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in self.server.rate_limit_headers().items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path.rstrip("/") == "/api/v1/access_token":
+            self._send(200, {"access_token": "fake-token", "token_type": "bearer",
+                             "expires_in": 86400, "scope": "*"})
+        else:
+            self._send(404, {"error": 404})
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        match = _LISTING.match(url.path)
+        if not match:
+            self._send(404, {"error": 404})
+            return
+        query = parse_qs(url.query)
+        limit = int(query.get("limit", ["25"])[0])
+        posts = self.server.submissions(match.group(1) or match.group(2))
+        before = query.get("before", [None])[0]
+        if before:
+            # newer than `before` (a fullname), like Reddit's listing param;
+            # an anchor that no longer exists gives an empty listing
+            names = [p["name"] for p in posts]
+            posts = posts[:names.index(before)] if before in names else []
+        self._send(200, {"kind": "Listing", "data": {
+            "after": None, "before": None,
+            "children": [{"kind": "t3", "data": p} for p in posts[:limit]],
+        }})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake Reddit API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to each listing request")
+    args = parser.parse_args()
+
+    server = FakeRedditServer(args.port, latency=args.latency)
+    print(f"Fake Reddit listening on {server.url}")
+    server.serve_forever()
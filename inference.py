@@ -0,0 +1,496 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# ----------------------------
+# MODEL CONFIG
+# ----------------------------
+MODEL_PATH = "best_svm_model (1).pkl"
+CALIBRATION_PATH = os.path.splitext(MODEL_PATH)[0] + ".calibration.json"
+ARTIFACT_DIR = os.path.splitext(MODEL_PATH)[0] + ".scorer"  # written by export_model.py
+ARTIFACT_FORMAT = 1
+BATCH_SIZE = 2048  # texts vectorized per sparse-matrix pass
+
+PREDICTIONS = metrics.REGISTRY.counter("sentiminds_predictions_total", "Texts scored by the model (cache misses)")
+
+
+def load_model(path=MODEL_PATH):
+    import joblib  # only needed for the pickle; the mmap artifact skips it
+    return joblib.load(path)
+
+
+def model_version(path=MODEL_PATH):
+    # content hash of the pickle, so a replaced model gets a new version
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def model_stamp(path=MODEL_PATH):
+    # cheap change detector for cache keys: (mtime, size) of the pickle
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def calibration_stamp(path=CALIBRATION_PATH):
+    # like model_stamp, for the calibration JSON; None while there is none
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def read_artifact_meta(directory=ARTIFACT_DIR):
+    with open(os.path.join(directory, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_scorer(model_path=MODEL_PATH, artifact_dir=ARTIFACT_DIR):
+    # Prefer the exported mmap artifact; fall back to unpickling the
+    # pipeline when it is missing or was exported from a different model.
+    version = model_version(model_path)
+    try:
+        if read_artifact_meta(artifact_dir)["source_version"] == version:
+            return LinearScorer.load(artifact_dir)
+    except (OSError, ValueError, KeyError):
+        pass
+    scorer = LinearScorer.from_pipeline(load_model(model_path))
+    scorer.version = version
+    return scorer
+
+
+def sentiment_label(prediction):
+    return "Positive" if prediction == 1 else "Negative"
+
+
+# ----------------------------
+# BATCH INFERENCE
+# ----------------------------
+def predict_batch(model, texts, batch_size=BATCH_SIZE):
+    # Runs the TF-IDF step once per chunk of texts and reuses the decision
+    # scores for the labels, so the LinearSVC is only evaluated once per text.
+    texts = list(texts)
+    if not texts:
+        return np.empty(0, dtype=int), np.empty(0, dtype=float)
+
+    vectorizer = model[:-1]
+    clf = model[-1]
+    PREDICTIONS.inc(len(texts))
+
+    predictions, scores = [], []
+    for start in range(0, len(texts), batch_size):
+        X = vectorizer.transform(texts[start:start + batch_size])
+        chunk_scores = clf.decision_function(X)
+        predictions.append(clf.classes_[(chunk_scores > 0).astype(int)])
+        scores.append(chunk_scores)
+
+    return np.concatenate(predictions), np.concatenate(scores)
+
+
+# ----------------------------
+# COMPILED LINEAR SCORER
+# ----------------------------
+class LinearScorer:
+    # The pipeline is a TF-IDF vocabulary, IDF weights and one LinearSVC
+    # coefficient vector, so a text's score is a dict lookup per n-gram plus
+    # a short dot product. This skips building a scipy sparse matrix per call.
+
+    def __init__(self, vocabulary, idf, weights, intercept, classes,
+                 token_pattern=r"(?u)\b\w\w+\b", ngram_range=(1, 1), lowercase=True, version=None):
+        self.version = version  # content hash of the source pickle, if known
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights  # idf folded into the classifier coefficients
+        self.intercept = float(intercept)
+        self.classes = np.asarray(classes)
+        self.ngram_range = tuple(ngram_range)
+        self.lowercase = lowercase
+        self.token_pattern = token_pattern
+        self._token_re = re.compile(token_pattern)
+
+    @classmethod
+    def from_pipeline(cls, model):
+        vectorizer, clf = model[0], model[-1]
+        if (vectorizer.analyzer != "word" or vectorizer.tokenizer is not None
+                or vectorizer.preprocessor is not None or vectorizer.stop_words is not None
+                or vectorizer.strip_accents is not None or vectorizer.binary
+                or vectorizer.sublinear_tf or not vectorizer.use_idf or vectorizer.norm != "l2"):
+            raise ValueError("LinearScorer only supports plain word n-gram TF-IDF with l2 norm")
+        if clf.coef_.shape[0] != 1:
+            raise ValueError("LinearScorer only supports binary linear classifiers")
+        idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+        return cls(
+            vocabulary=vectorizer.vocabulary_,
+            idf=idf,
+            weights=idf * np.asarray(clf.coef_[0], dtype=np.float64),
+            intercept=clf.intercept_[0],
+            classes=clf.classes_,
+            token_pattern=vectorizer.token_pattern,
+            ngram_range=vectorizer.ngram_range,
+            lowercase=vectorizer.lowercase,
+        )
+
+    # On-disk layout (one directory):
+    #   vocab.txt    terms sorted, one per line; line i is feature i
+    #   idf.npy      float64 IDF weights in the same order
+    #   weights.npy  float64 idf * coef in the same order
+    #   meta.json    intercept, classes, tokenizer settings, source model version
+    # The .npy files are opened with mmap so worker processes share pages and
+    # loading needs neither pickle nor scikit-learn.
+    def save(self, directory, source_version=None):
+        os.makedirs(directory, exist_ok=True)
+        terms = sorted(self.vocabulary)
+        order = np.fromiter((self.vocabulary[t] for t in terms), dtype=np.intp, count=len(terms))
+        with open(os.path.join(directory, "vocab.txt"), "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(terms))
+        np.save(os.path.join(directory, "idf.npy"), np.asarray(self.idf)[order])
+        np.save(os.path.join(directory, "weights.npy"), np.asarray(self.weights)[order])
+        meta = {
+            "format": ARTIFACT_FORMAT,
+            "source_version": source_version,
+            "intercept": self.intercept,
+            "classes": self.classes.tolist(),
+            "token_pattern": self.token_pattern,
+            "ngram_range": list(self.ngram_range),
+            "lowercase": self.lowercase,
+            "n_features": len(terms),
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory):
+        meta = read_artifact_meta(directory)
+        if meta["format"] != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported scorer artifact format: {meta['format']}")
+        with open(os.path.join(directory, "vocab.txt"), encoding="utf-8") as f:
+            terms = f.read().split("\n")
+        return cls(
+            vocabulary=dict(zip(terms, range(len(terms)))),
+            idf=np.load(os.path.join(directory, "idf.npy"), mmap_mode="r"),
+            weights=np.load(os.path.join(directory, "weights.npy"), mmap_mode="r"),
+            intercept=meta["intercept"],
+            classes=meta["classes"],
+            token_pattern=meta["token_pattern"],
+            ngram_range=meta["ngram_range"],
+            lowercase=meta["lowercase"],
+            version=meta["source_version"],
+        )
+
+    def tokens(self, text):
+        # the vectorizer's own analyzer (unigrams), also used for word clouds
+        if self.lowercase:
+            text = text.lower()
+        return self._token_re.findall(text)
+
+    def _term_counts(self, text):
+        tokens = self.tokens(text)
+        vocab = self.vocabulary
+        counts = {}
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            grams = tokens if n == 1 else (" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+            for gram in grams:
+                idx = vocab.get(gram)
+                if idx is not None:
+                    counts[idx] = counts.get(idx, 0) + 1
+        return counts
+
+    def score(self, text):
+        counts = self._term_counts(text)
+        if not counts:
+            return self.intercept
+        idx = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        norm = np.sqrt(np.dot(tf * tf, self.idf[idx] ** 2))
+        return float(np.dot(tf, self.weights[idx]) / norm + self.intercept)
+
+    def decision_function(self, texts):
+        # Term counts of the whole batch are concatenated and each text's dot
+        # product and l2 norm summed with one np.add.reduceat over its slice,
+        # so the numpy work is a few calls per batch rather than per text.
+        # A single text takes the cheaper scalar path.
+        if len(texts) == 1:
+            return np.array([self.score(texts[0])], dtype=np.float64)
+        idx, tf, lengths = [], [], []
+        for text in texts:
+            counts = self._term_counts(text)
+            idx.extend(counts)
+            tf.extend(counts.values())
+            lengths.append(len(counts))
+        scores = np.full(len(lengths), self.intercept, dtype=np.float64)
+        if not idx:
+            return scores
+        idx = np.array(idx, dtype=np.intp)
+        tf = np.array(tf, dtype=np.float64)
+        lengths = np.array(lengths)
+        found = lengths > 0  # texts with no known term score the intercept
+        starts = (np.cumsum(lengths) - lengths)[found]
+        norms = np.sqrt(np.add.reduceat(tf * tf * self.idf[idx] ** 2, starts))
+        scores[found] += np.add.reduceat(tf * self.weights[idx], starts) / norms
+        return scores
+
+    def predict_batch(self, texts):
+        scores = self.decision_function(texts)
+        PREDICTIONS.inc(len(scores))
+        return self.classes[(scores > 0).astype(int)], scores
+
+    def normalize(self, text):
+        # Texts that normalize equal get identical scores: the tokenizer
+        # ignores whitespace runs, and case when the vectorizer lowercases.
+        text = " ".join(text.split())
+        return text.lower() if self.lowercase else text
+
+
+# ----------------------------
+# PREDICTION CACHE
+# ----------------------------
+class PredictionCache:
+    # Bounded LRU with a TTL, shared by every session in the process. Keys
+    # hash the model version with the normalized text, and the cache empties
+    # itself the first time it sees a new model version.
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(normalized_text, version):
+        return hashlib.sha1(f"{version}\0{normalized_text}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[2] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, prediction, score):
+        with self._lock:
+            self._entries[key] = (prediction, score, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def check_version(self, version):
+        with self._lock:
+            if version != self.model_version:
+                self._entries.clear()
+                self.model_version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+PREDICTION_CACHE = PredictionCache()
+
+
+def _cache_metrics():
+    stats = PREDICTION_CACHE.stats()
+    return [("sentiminds_prediction_cache_hits_total", "counter", "Prediction cache hits", {}, stats["hits"]),
+            ("sentiminds_prediction_cache_misses_total", "counter", "Prediction cache misses", {}, stats["misses"]),
+            ("sentiminds_prediction_cache_entries", "gauge", "Entries in the prediction cache", {}, stats["size"])]
+
+
+metrics.REGISTRY.register_collector(_cache_metrics)
+
+
+def cached_predict_batch(scorer, texts, cache=PREDICTION_CACHE):
+    # Same return value as LinearScorer.predict_batch; only cache misses are
+    # scored, together in one call.
+    texts = list(texts)
+    cache.check_version(scorer.version)
+    keys = [cache.key(scorer.normalize(t), scorer.version) for t in texts]
+    predictions = np.empty(len(texts), dtype=scorer.classes.dtype)
+    scores = np.empty(len(texts), dtype=np.float64)
+
+    missing = []
+    for i, key in enumerate(keys):
+        entry = cache.get(key)
+        if entry is None:
+            missing.append(i)
+        else:
+            predictions[i], scores[i] = entry
+
+    if missing:
+        miss_predictions, miss_scores = scorer.predict_batch([texts[i] for i in missing])
+        for i, prediction, score in zip(missing, miss_predictions, miss_scores):
+            predictions[i], scores[i] = prediction, score
+            cache.put(keys[i], prediction, score)
+
+    return predictions, scores
+
+
+# ----------------------------
+# MICRO-BATCHING
+# ----------------------------
+class MicroBatcher:
+    # Collects single-text requests from many threads (or event loops, via
+    # asyncio.wrap_future) and scores them together: a batch is flushed once
+    # it holds max_batch_size texts or its first text has waited max_wait
+    # seconds. With max_wait=0 (the default) a batch is whatever queued up
+    # while the previous one was scored, so a lone request is never held
+    # back; a wait only pays off for engines whose per-text cost falls with
+    # batch size faster than the wait adds. predict_fn takes a list of texts and returns
+    # (predictions, scores), e.g. lambda texts: cached_predict_batch(scorer, texts).
+    # batch_sizes and queue_latency (submit -> batch start, seconds) are
+    # histograms of every flush.
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait=0.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_sizes = metrics.Histogram(metrics.SIZE_BUCKETS)
+        self.queue_latency = metrics.Histogram(metrics.LATENCY_BUCKETS)
+        # the newest batcher in the process is the one exported
+        metrics.REGISTRY.register("sentiminds_microbatch_size", "Texts per micro-batch", self.batch_sizes)
+        metrics.REGISTRY.register("sentiminds_microbatch_queue_seconds", "Wait before a text's batch starts",
+                                  self.queue_latency)
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        # returns a Future resolving to (prediction, score)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._pending.append((text, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def predict(self, text, timeout=None):
+        return self.submit(text).result(timeout)
+
+    def close(self, timeout=None):
+        # Stops the worker thread once the texts already queued are scored,
+        # e.g. when a reloaded model gets a new batcher
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        # None once closed and drained
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # futures cancelled while queued (e.g. the awaiting API request
+            # went away) are dropped; the rest can no longer be cancelled
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._score(batch)
+            except Exception as e:  # never let one batch stop the worker
+                log.exception("micro-batch of %d texts failed", len(batch))
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, batch):
+        started = time.monotonic()
+        self.batch_sizes.observe(len(batch))
+        for _, _, submitted in batch:
+            self.queue_latency.observe(started - submitted)
+        predictions, scores = self.predict_fn([text for text, _, _ in batch])
+        for (_, future, _), prediction, score in zip(batch, predictions, scores):
+            future.set_result((prediction, score))
+
+    def stats(self):
+        return {"max_batch_size": self.max_batch_size, "max_wait": self.max_wait,
+                "batch_sizes": self.batch_sizes.snapshot(), "queue_latency": self.queue_latency.snapshot(),
+                "queue_latency_p50": self.queue_latency.quantile(0.5),
+                "queue_latency_p99": self.queue_latency.quantile(0.99)}
+
+
+# ----------------------------
+# CONFIDENCE CALIBRATION
+# ----------------------------
+# The LinearSVC has no predict_proba, so decision scores are mapped to
+# probabilities with a calibrator fitted offline by calibrate.py and stored
+# next to the model as JSON:
+#   {"method": "platt", "coef": a, "intercept": b}
+#   {"method": "isotonic", "x": [...], "y": [...]}
+def load_calibrator(path=CALIBRATION_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_calibrator(calibrator, path=CALIBRATION_PATH):
+    # written aside and renamed, so a running app that sees the new stamp
+    # never reads a half-written file
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(calibrator, f, indent=2)
+    os.replace(tmp, path)
+
+
+def positive_probability(scores, calibrator=None):
+    scores = np.asarray(scores, dtype=float)
+    if calibrator is None:
+        # uncalibrated fallback: logistic of the raw margin
+        return 1.0 / (1.0 + np.exp(-scores))
+    if calibrator["method"] == "platt":
+        return 1.0 / (1.0 + np.exp(-(calibrator["coef"] * scores + calibrator["intercept"])))
+    if calibrator["method"] == "isotonic":
+        return np.interp(scores, calibrator["x"], calibrator["y"])
+    raise ValueError(f"Unknown calibration method: {calibrator['method']}")
+
+
+def confidence_scores(scores, calibrator=None):
+    # probability of whichever class was predicted
+    p = positive_probability(scores, calibrator)
+    return np.where(np.asarray(scores) > 0, p, 1.0 - p)
@@ -0,0 +1,202 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ----------------------------
+# HISTOGRAMS
+# ----------------------------
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class Histogram:
+    # Cumulative-style bucket counts (Prometheus semantics: a value lands in
+    # the first bucket whose upper bound is >= value) plus count and sum.
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target, seen = q * self.count, 0
+            for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+                seen += n
+                if seen >= target:
+                    return bound
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            return {"buckets": dict(zip(self.buckets + (float("inf"),), self.counts)),
+                    "count": self.count, "sum": self.sum,
+                    "mean": self.sum / self.count if self.count else 0.0}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+# ----------------------------
+# REGISTRY / PROMETHEUS EXPORT
+# ----------------------------
+# Metrics are registered by name and labels. Objects that already keep
+# their own counts (the prediction cache, the write-behind queue) are
+# exported through collector callbacks read at scrape time instead of
+# being counted twice.
+class Registry:
+    def __init__(self):
+        self._metrics = {}     # (name, labels) -> metric
+        self._help = {}        # name -> (type, help)
+        self._collectors = []  # callables yielding (name, type, help, labels, value)
+        self._lock = threading.Lock()
+
+    def _get(self, kind, factory, name, help, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, (kind, help))
+            if key not in self._metrics:
+                self._metrics[key] = factory()
+            return self._metrics[key]
+
+    def counter(self, name, help, **labels):
+        return self._get("counter", Counter, name, help, labels)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, **labels):
+        return self._get("histogram", lambda: Histogram(buckets), name, help, labels)
+
+    def register(self, name, help, metric, **labels):
+        # export an existing Counter/Histogram, replacing any earlier one
+        kind = "histogram" if isinstance(metric, Histogram) else "counter"
+        with self._lock:
+            self._help.setdefault(name, (kind, help))
+            self._metrics[(name, tuple(sorted(labels.items())))] = metric
+
+    def find(self, name):
+        # [(labels dict, metric)] registered under `name`
+        with self._lock:
+            return [(dict(labels), metric) for (n, labels), metric in self._metrics.items() if n == name]
+
+    def register_collector(self, collect):
+        with self._lock:
+            self._collectors.append(collect)
+
+    def samples(self):
+        # [(name, type, help, labels, value)]; histogram values are snapshots
+        with self._lock:
+            metrics = list(self._metrics.items())
+            collectors = list(self._collectors)
+        samples = []
+        for (name, labels), metric in sorted(metrics, key=lambda item: item[0]):
+            kind, help = self._help[name]
+            value = metric.snapshot() if isinstance(metric, Histogram) else metric.value
+            samples.append((name, kind, help, dict(labels), value))
+        for collect in collectors:
+            samples.extend(collect())
+        return samples
+
+    def render(self):
+        # Prometheus text exposition format (version 0.0.4)
+        lines, described = [], set()
+        for name, kind, help, labels, value in self.samples():
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                cumulative = 0
+                for bound, n in value["buckets"].items():
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {value['sum']!r}")
+                lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ----------------------------
+# STAGE TIMING
+# ----------------------------
+STAGE_SECONDS = "sentiminds_stage_seconds"
+
+
+@contextmanager
+def timed(stage, registry=REGISTRY):
+    # with metrics.timed("predict"): ...  -> sentiminds_stage_seconds{stage="predict"}
+    histogram = registry.histogram(STAGE_SECONDS, "Wall time of each app stage", stage=stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def stage_summary(registry=REGISTRY):
+    # [{"stage", "count", "mean_ms", "p50_ms", "p95_ms"}] for the admin panel
+    stages = [(labels["stage"], h) for labels, h in registry.find(STAGE_SECONDS)]
+    return [{"stage": stage, "count": h.count, "mean_ms": h.sum / h.count * 1e3 if h.count else 0.0,
+             "p50_ms": h.quantile(0.5) * 1e3, "p95_ms": h.quantile(0.95) * 1e3}
+            for stage, h in sorted(stages)]
+
+
+# ----------------------------
+# HTTP ENDPOINT
+# ----------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    # serves GET /metrics from a daemon thread; returns the server
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
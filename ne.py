@@ -1,63 +1,50 @@
 import streamlit as st
 import re 
-import base64
+import assets
 import pathlib
-import joblib
-import pandas as pd
-import matplotlib.pyplot as plt
-import sqlite3
-from datetime import datetime
-import plotly.express as px
-from wordcloud import WordCloud
-import praw
+import tempfile
+from datetime import timedelta
+import inference
+import storage
+import export
+import metrics
+import os
+import session_stats
+from storage import create_main_tables, add_user, verify_user
 
 # ----------------------------
 # GLOBAL CONFIG
 # ----------------------------
-DB_PATH = "senti.db"
 AUTHORIZED_ADMINS = ["tena", "rita"]  # admin usernames
 
 # ----------------------------
-# DATABASE
+# DATABASE (pooled connections + write-behind queue, see storage.py)
 # ----------------------------
-def create_main_tables():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        username TEXT PRIMARY KEY,
-        password TEXT
-    )''')
-
-    c.execute('''CREATE TABLE IF NOT EXISTS sentiment_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        text TEXT,
-        prediction TEXT,
-        confidence REAL,
-        timestamp TEXT
-    )''')
-
-    conn.commit()
-    conn.close()
-
-def add_user(username, password):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (username, password))
-    conn.commit()
-    conn.close()
-
-def verify_user(username, password):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-    data = c.fetchone()
-    conn.close()
-    return data is not None
-
+# Migrations run on the first call in this process; every later rerun
+# returns immediately. pandas, plotly, praw (via reddit_ingest) and
+# wordcloud are imported where they are first used, so the login page
+# doesn't wait for them.
 create_main_tables()
 
+# ----------------------------
+# METRICS (Prometheus text at http://127.0.0.1:$SENTIMINDS_METRICS_PORT/metrics if set)
+# ----------------------------
+@st.cache_resource
+def start_metrics_server(port):
+    return metrics.start_http_server(port)
+
+if os.environ.get("SENTIMINDS_METRICS_PORT"):
+    start_metrics_server(int(os.environ["SENTIMINDS_METRICS_PORT"]))
+
+# ----------------------------
+# STATIC ASSETS (optimized once, served by URL, see assets.py)
+# ----------------------------
+STATIC_SERVING = st.get_option("server.enableStaticServing")
+
+
+def asset_src(image_path):
+    return assets.asset_url(image_path, STATIC_SERVING)
+
 # ----------------------------
 # PAGE SWITCH
 # ----------------------------
@@ -79,14 +66,13 @@ def logout():
 # BACKGROUND IMAGE
 # ----------------------------
 def set_bg_image(image_path):
-    with open(image_path, "rb") as f:
-        data = base64.b64encode(f.read()).decode()
+    data = asset_src(image_path)
 
     st.markdown(
         f"""
         <style>
         [data-testid="stAppViewContainer"] {{
-            background-image: url("data:image/png;base64,{data}");
+            background-image: url("{data}");
             background-size: cover;
             background-repeat: no-repeat;
             background-position: center;
@@ -352,12 +338,10 @@ def landing_page():
         unsafe_allow_html=True
     )
 
-    # Load local logo as base64
+    # Optimized local logo, served by URL
     logo_path = "logo.png"
     try:
-        with open(logo_path, "rb") as f:
-            logo_base64 = base64.b64encode(f.read()).decode("utf-8")
-        logo_src = f"data:image/png;base64,{logo_base64}"
+        logo_src = asset_src(logo_path)
     except Exception as e:
         st.warning(f"⚠️ Could not load logo: {e}")
         logo_src = "https://via.placeholder.com/50"  # fallback
@@ -528,7 +512,8 @@ def landing_page():
         with left_col:
             try:
                 if local_image_path.exists():
-                    st.image(str(local_image_path), caption=None, use_container_width=True)
+                    image = f"/{asset_src(local_image_path.name)}" if STATIC_SERVING else assets.asset_path(local_image_path.name)
+                    st.image(image, caption=None, use_container_width=True)
                 else:
                     st.warning("⚠️ Image 'pic_1.png' not found in the app folder.")
             except Exception as e:
@@ -620,60 +605,65 @@ def sentiment_analysis_page():
     </style>
     """, unsafe_allow_html=True)
 
-    # Load logo again since separate page
+    # Logo again since separate page (URL is computed once per process)
     logo_path = "logo.png"
     try:
-        with open(logo_path, "rb") as f:
-            logo_base64 = base64.b64encode(f.read()).decode("utf-8")
-        logo_src = f"data:image/png;base64,{logo_base64}"
+        logo_src = asset_src(logo_path)
     except:
         logo_src = "https://via.placeholder.com/50"
 
 
     # Load model with cache_resource decorator to avoid reloading
-    @st.cache_resource
-    def load_model_local():
-        model = joblib.load("best_svm_model (1).pkl")  # Update your path
+    # (keyed on the pickle's mtime/size so a replaced model is reloaded)
+    @st.cache_resource(max_entries=1)
+    def load_model_local(model_stamp):
+        # Compiled LinearScorer, mmap-loaded from the artifact written by
+        # export_model.py (falls back to the pickle in inference.MODEL_PATH).
+        # Parity with the pipeline is checked by `python bench.py scorer`
+        model = inference.load_scorer()
         return model
 
-    model = load_model_local()
+    # keyed like the model, so a calibration written by calibrate.py is
+    # picked up on the next rerun
+    @st.cache_resource(max_entries=1)
+    def load_calibrator_local(calibration_stamp):
+        return inference.load_calibrator()
 
-    # Database setup (single DB used across app)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    c = conn.cursor()
-    create_main_tables()  # ensure tables exist
+    # One micro-batcher per process: concurrent "Analyze" clicks from
+    # different sessions are scored together in one call
+    @st.cache_resource(max_entries=1, on_release=lambda batcher: batcher.close())
+    def load_batcher_local(model_stamp):
+        model = load_model_local(model_stamp)
+        return inference.MicroBatcher(lambda texts: inference.cached_predict_batch(model, texts))
 
-    def save_to_db(username, text, prediction, confidence):
-        c.execute("INSERT INTO sentiment_data (username, text, prediction, confidence, timestamp) VALUES (?,?,?,?,?)",
-                  (username, text, prediction, confidence, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
+    model_stamp = inference.model_stamp()
+    model = load_model_local(model_stamp)
+    batcher = load_batcher_local(model_stamp)
+    calibrator = load_calibrator_local(inference.calibration_stamp())
+
+    # Database setup (single DB used across app, schema created at import)
+    save_to_db = storage.save_to_db  # queued, committed in batches
 
     # Reddit functions
     def initialize_reddit_client():
-        reddit = praw.Reddit(
-            client_id="maLH-M6awZujpG7uOFz0fQ",
-            client_secret="8R2sqWZG7x2yvgxVYEZ_IxsPe3_NkQ",
-            user_agent="SentimentAnalysisApp"
-        )
-        try:
-            _ = reddit.user.me()
-        except Exception as e:
-            st.error(f"Reddit authentication failed: {e}")
-        return reddit
-
-    def get_last_posts(reddit, reddit_username, limit=5):
-        try:
-            redditor = reddit.redditor(reddit_username)
-            posts = []
-            for submission in redditor.submissions.new(limit=limit):
-                post_text = submission.title
-                if submission.selftext:
-                    post_text += " " + submission.selftext
-                posts.append(post_text)
-            return posts
-        except Exception as e:
-            st.error(f"Error fetching Reddit posts: {e}")
-            return []
+        # one process-wide client (thread pool + shared rate limiter), reused across clicks
+        import reddit_ingest
+        return reddit_ingest.get_ingestor()
+
+    def get_last_posts(reddit, reddit_input, limit=5):
+        # accepts "name", "u/name", "r/subreddit" or a comma-separated mix,
+        # fetched concurrently; sources seen before only fetch newer posts
+        # and reuse the stored predictions of the rest
+        import reddit_ingest
+        redditors, subreddits = reddit_ingest.parse_sources(reddit_input)
+        with metrics.timed("reddit_fetch"):
+            results = reddit.fetch_since_last(redditors, subreddits, limit)
+        for source, result in results.items():
+            if isinstance(result, Exception):
+                st.error(f"Error fetching Reddit posts for {source}: {result}")
+        with metrics.timed("predict"):
+            reddit_ingest.score_cached_posts(results, model)
+        return [p for result in results.values() if isinstance(result, list) for p in result]
 
     def create_card(text, sentiment):
         card_bg = "#09e647" if sentiment == "Positive" else "#e02020"
@@ -689,27 +679,17 @@ def sentiment_analysis_page():
             st.warning("No posts to generate a word cloud.")
             return
 
-        fig, axes = plt.subplots(1, 2, figsize=(15, 6))
-
-        if pos_texts:
-            pos_text = " ".join(pos_texts)
-            wc_pos = WordCloud(width=600, height=400, background_color='white', colormap='Greens').generate(pos_text)
-            axes[0].imshow(wc_pos, interpolation='bilinear')
-            axes[0].set_title("Positive Words", fontsize=18, color='green')
-        else:
-            axes[0].text(0.5, 0.5, "No Positive Posts", horizontalalignment='center', verticalalignment='center', fontsize=16)
-        axes[0].axis("off")
-
-        if neg_texts:
-            neg_text = " ".join(neg_texts)
-            wc_neg = WordCloud(width=600, height=400, background_color='white', colormap='Reds').generate(neg_text)
-            axes[1].imshow(wc_neg, interpolation='bilinear')
-            axes[1].set_title("Negative Words", fontsize=18, color='red')
-        else:
-            axes[1].text(0.5, 0.5, "No Negative Posts", horizontalalignment='center', verticalalignment='center', fontsize=16)
-        axes[1].axis("off")
+        # frequencies come from the model's tokenizer; images are cached by content hash
+        import wordclouds
+        show_wordclouds(wordclouds.sentiment_clouds(pos_texts, neg_texts, model.tokens), "Posts")
 
-        st.pyplot(fig)
+    def show_wordclouds(images, noun):
+        for col, (label, color) in zip(st.columns(2), (("Positive", "green"), ("Negative", "red"))):
+            col.markdown(f"<h4 style='text-align:center; color:{color};'>{label} Words</h4>", unsafe_allow_html=True)
+            if images[label] is not None:
+                col.image(images[label], width="stretch")
+            else:
+                col.markdown(f"<p style='text-align:center;'>No {label} {noun}</p>", unsafe_allow_html=True)
 
     # UI
     st.markdown(
@@ -788,88 +768,325 @@ def sentiment_analysis_page():
     st.markdown("<div class='title'>SENTIMIND </div>", unsafe_allow_html=True)
     st.markdown("<div class='subtitle'>Pick your preferred input method.</div>", unsafe_allow_html=True)
 
-    input_type = st.radio("", ["Enter Text", "Reddit User ID"], horizontal=True)
-    user_input = st.text_input("✍️ Enter here:")
-
-    if 'history' not in st.session_state:
-        st.session_state.history = []
+    # label counts + a ring buffer of recent scores, constant size however
+    # many posts the session analyzes (see session_stats.py)
+    if 'session_stats' not in st.session_state:
+        st.session_state.session_stats = session_stats.SessionStats()
+
+    # Partial reruns: each section below is a fragment, so a click or input
+    # inside it reruns only that section, not the styling, logo and the
+    # other sections. The admin charts are memoized on the data they show.
+    def session_pie_spec(stats):
+        # Vega-Lite pie drawn by the browser: a few hundred bytes of JSON per
+        # update instead of a matplotlib figure rasterized to PNG (~120 ms)
+        values = [{"Sentiment": label, "count": n, "label": f"{label} {share:.1%}"}
+                  for label, n, share in stats.shares()]
+        return {
+            "title": {"text": "Sentiment Distribution in Your Session", "fontSize": 14},
+            "data": {"values": values},
+            "encoding": {"theta": {"field": "count", "type": "quantitative", "stack": True},
+                         "color": {"field": "Sentiment", "type": "nominal", "legend": None,
+                                   "scale": {"domain": ["Positive", "Negative"], "range": ["#28a745", "#dc3545"]}}},
+            "layer": [{"mark": {"type": "arc", "outerRadius": 110}},
+                      {"mark": {"type": "text", "radius": 135, "fontSize": 13},
+                       "encoding": {"text": {"field": "label", "type": "nominal"}}}],
+            "height": 300,
+        }
 
-    col1, col2, col3 = st.columns([0.1,1,0.1])
-    with col2:
-        if st.button("🔍 Analyze Sentiment"):
-            if user_input.strip() == "":
-                st.warning("⚠️ Please enter a valid input.")
-            else:
-                # ensure current_user exists (fallback to 'anonymous' if missing)
-                current_user = st.session_state.get("current_user", "anonymous")
-
-                if input_type=="Enter Text":
-                    prediction = model.predict([user_input])[0]
-                    confidence = 0.9
-                    sentiment = "😊 Positive" if prediction==1 else "☹️ Negative"
-                    color = "#28a745" if prediction==1 else "#dc3545"
-                    st.markdown(f"<div class='result-card' style='color:{color};'>Predicted Sentiment: {sentiment}</div>", unsafe_allow_html=True)
-                    # save with username
-                    save_to_db(current_user, user_input, sentiment, confidence)
-                    st.session_state.history.append(sentiment.split()[1])
-                else:
-                    reddit = initialize_reddit_client()
-                    posts = get_last_posts(reddit, user_input)
-                    pos_texts, neg_texts = [], []
-                    for post in posts:
-                        prediction = model.predict([post])[0]
-                        sentiment_word = "Positive" if prediction==1 else "Negative"
-                        st.markdown(create_card(post, sentiment_word), unsafe_allow_html=True)
-                        if prediction==1: pos_texts.append(post)
-                        else: neg_texts.append(post)
-                        save_to_db(current_user, post, sentiment_word, 0.9)
-                        st.session_state.history.append(sentiment_word)
-                    if pos_texts or neg_texts:
-                        generate_sentiment_wordcloud(pos_texts, neg_texts)
+    def session_trend_spec(recent, window=20):
+        # the last RECENT_SCORES raw scores (> 0 is Positive) and their
+        # rolling mean, computed by the browser
+        return {
+            "title": {"text": f"Recent Scores (rolling mean of {window})", "fontSize": 14},
+            "data": {"values": [{"n": n, "score": score} for n, score in recent]},
+            "transform": [{"window": [{"op": "mean", "field": "score", "as": "rolling"}], "frame": [1 - window, 0]}],
+            "encoding": {"x": {"field": "n", "type": "quantitative", "title": "Prediction"}},
+            "layer": [{"mark": {"type": "point", "opacity": 0.4, "color": "#555"},
+                       "encoding": {"y": {"field": "score", "type": "quantitative", "title": "Score"}}},
+                      {"mark": {"type": "line", "color": "#0D47A1"},
+                       "encoding": {"y": {"field": "rolling", "type": "quantitative"}}},
+                      {"mark": {"type": "rule", "strokeDash": [4, 4]}, "encoding": {"y": {"datum": 0}}}],
+            "height": 200,
+        }
 
     # Session Chart
-    if len(st.session_state.history) > 0:
-        st.markdown("### 📊 Sentiment Summary (This Session)")
-        df = pd.DataFrame(st.session_state.history, columns=["Sentiment"])
-        df["Sentiment"] = df["Sentiment"].apply(lambda x: "Positive" if "Positive" in x else "Negative")
-        counts = df["Sentiment"].value_counts()
-        fig, ax = plt.subplots()
-        ax.pie(counts, labels=counts.index, autopct="%1.1f%%", startangle=90, shadow=True)
-        plt.title("Sentiment Distribution in Your Session", fontsize=14, pad=20)
-        st.pyplot(fig)
+    @st.fragment
+    def session_chart():
+        stats = st.session_state.session_stats
+        if len(stats) > 0:
+            st.markdown("### 📊 Sentiment Summary (This Session)")
+            with metrics.timed("session_chart"):
+                st.vega_lite_chart(spec=session_pie_spec(stats), width="stretch")
+                if len(stats.recent) > 1:
+                    st.vega_lite_chart(spec=session_trend_spec(stats.recent), width="stretch")
+
+    @st.fragment
+    def analysis_section():
+        input_type = st.radio("", ["Enter Text", "Reddit User ID", "Upload File"], horizontal=True)
+        if input_type == "Upload File":
+            # CSV (with a text column), JSONL ({"text": ...} per line) or TXT (one text per line)
+            uploaded = st.file_uploader("📄 Upload a file:", type=["csv", "jsonl", "txt"])
+            text_field = st.text_input("Text column (CSV/JSONL, blank to auto-detect):")
+            user_input = uploaded.name if uploaded is not None else ""
+        else:
+            user_input = st.text_input("✍️ Enter here:")
+
+        col1, col2, col3 = st.columns([0.1,1,0.1])
+        with col2:
+            if st.button("🔍 Analyze Sentiment"):
+                if user_input.strip() == "":
+                    st.warning("⚠️ Please enter a valid input.")
+                else:
+                    # ensure current_user exists (fallback to 'anonymous' if missing)
+                    current_user = st.session_state.get("current_user", "anonymous")
+
+                    if input_type=="Enter Text":
+                        with metrics.timed("predict"):
+                            prediction, score = batcher.predict(user_input)
+                        confidence = float(inference.confidence_scores([score], calibrator)[0])
+                        sentiment = "😊 Positive" if prediction==1 else "☹️ Negative"
+                        color = "#28a745" if prediction==1 else "#dc3545"
+                        st.markdown(f"<div class='result-card' style='color:{color};'>Predicted Sentiment: {sentiment} ({confidence:.0%} confidence)</div>", unsafe_allow_html=True)
+                        # save with username
+                        with metrics.timed("save_to_db"):
+                            save_to_db(current_user, user_input, sentiment, confidence,
+                                       score=float(score), model_version=model.version)
+                        st.session_state.session_stats.add(sentiment, float(score))
+                    elif input_type=="Upload File":
+                        # streamed in chunks: each chunk is scored as one batch and
+                        # inserted in one transaction, so memory stays flat
+                        import bulk
+                        import pandas as pd
+                        progress = st.progress(0.0, text="Classifying...")
+                        size = uploaded.size or 1
+                        preview = []
+                        saved = {"rows": 0}  # chunks are committed as they go
+
+                        def on_chunk(summary, texts, labels):
+                            saved["rows"] = summary["rows"]
+                            preview.extend(zip(texts, labels))
+                            del preview[10:]
+                            done = min(uploaded.tell() / size, 1.0)
+                            progress.progress(done, text=f"Classified {summary['rows']:,} rows")
+
+                        try:
+                            with metrics.timed("bulk_upload"):
+                                summary = bulk.run_bulk(uploaded, bulk.detect_format(uploaded.name), model, calibrator,
+                                                        current_user, text_field.strip() or None, on_chunk=on_chunk)
+                        except ValueError as e:
+                            st.error(f"Could not read {uploaded.name}: {e}")
+                            if saved["rows"]:
+                                st.warning(f"The {saved['rows']:,} rows before it were already saved; "
+                                           f"upload only the rest of the file to avoid duplicates.")
+                        else:
+                            progress.progress(1.0, text=f"Classified {summary['rows']:,} rows")
+                            st.success(f"Saved {summary['rows']:,} predictions: "
+                                       f"{summary['Positive']:,} positive, {summary['Negative']:,} negative")
+                            if summary["skipped"]:
+                                st.warning(f"Skipped {summary['skipped']:,} rows with no text in the chosen "
+                                           f"field (set the text column to read another one)")
+                            if preview:
+                                st.dataframe(pd.DataFrame(preview, columns=["Text", "Sentiment"]), width="stretch")
+                    else:
+                        reddit = initialize_reddit_client()
+                        fetched = get_last_posts(reddit, user_input)
+                        posts = [p["text"] for p in fetched]
+                        predictions = [p["prediction"] for p in fetched]
+                        scores = [p["score"] for p in fetched]
+                        confidences = inference.confidence_scores(scores, calibrator)
+                        pos_texts, neg_texts = [], []
+                        for post, prediction, score, confidence in zip(posts, predictions, scores, confidences):
+                            sentiment_word = inference.sentiment_label(prediction)
+                            st.markdown(create_card(post, sentiment_word), unsafe_allow_html=True)
+                            if prediction==1: pos_texts.append(post)
+                            else: neg_texts.append(post)
+                            with metrics.timed("save_to_db"):
+                                save_to_db(current_user, post, sentiment_word, float(confidence),
+                                           score=score, model_version=model.version)
+                            st.session_state.session_stats.add(sentiment_word, score)
+                        if pos_texts or neg_texts:
+                            with metrics.timed("wordcloud"):
+                                generate_sentiment_wordcloud(pos_texts, neg_texts)
+
+        session_chart()  # nested, so each prediction updates it
+
+    analysis_section()
 
     # Database Visualization
     st.markdown("---")
     st.markdown("### 🗂️ All Stored Predictions")
 
-    col1, col2, col3 = st.columns([0.1,1,0.1])
-    with col2:
-        current_user = st.session_state.get("current_user", None)
-        if current_user in AUTHORIZED_ADMINS:
-            if st.button("Show Database Records"):
-                data_df = pd.read_sql_query("SELECT * FROM sentiment_data", conn)
-                data_df["prediction"] = data_df["prediction"].apply(lambda x: "Positive" if "Positive" in x else "Negative")
-                st.dataframe(data_df)
-
-                if not data_df.empty:
-                    pie = px.pie(data_df, names='prediction', title='Overall Sentiment Distribution', color_discrete_sequence=px.colors.qualitative.Set2)
-                    st.plotly_chart(pie)
-                    bar = px.bar(data_df, x='timestamp', color='prediction', title="Sentiment Over Time", labels={'timestamp': 'Timestamp', 'prediction': 'Sentiment'})
-                    st.plotly_chart(bar)
-        else:
-            st.info("Only authorized users can view stored sentiment history.")
+    @st.cache_data(max_entries=64)
+    def sentiment_pie(counts):
+        import plotly.express as px
+        return px.pie(names=[label for label, _ in counts], values=[n for _, n in counts], title='Overall Sentiment Distribution', color_discrete_sequence=px.colors.qualitative.Set2)
+
+    @st.cache_data(max_entries=64)
+    def sentiment_bar(over_time):
+        import pandas as pd
+        import plotly.express as px
+        over_time = pd.DataFrame(list(over_time), columns=["timestamp", "prediction", "count"])
+        return px.bar(over_time, x='timestamp', y='count', color='prediction', title="Sentiment Over Time", labels={'timestamp': 'Timestamp', 'prediction': 'Sentiment', 'count': 'Predictions'})
+
+    @st.fragment
+    def records_section():
+        col1, col2, col3 = st.columns([0.1,1,0.1])
+        with col2:
+            current_user = st.session_state.get("current_user", None)
+            if current_user in AUTHORIZED_ADMINS:
+                import pandas as pd
+
+                def toggle(key):
+                    st.session_state[key] = not st.session_state.get(key, False)
+
+                show_records = st.session_state.get("show_records", False)
+                show_metrics = st.session_state.get("show_metrics", False)
+                b1, b2 = st.columns(2)
+                # callbacks update the state before the fragment reruns, so the
+                # buttons don't need an st.rerun() (which would rerun the whole page)
+                with b1:
+                    st.button("Hide Database Records" if show_records else "Show Database Records",
+                              on_click=toggle, args=("show_records",))
+                with b2:
+                    st.button("Hide Metrics" if show_metrics else "Show Metrics",
+                              on_click=toggle, args=("show_metrics",))
+
+                if show_metrics:
+                    # this process only; the same numbers are scraped from /metrics
+                    st.markdown("#### ⏱️ Stage Timings")
+                    st.dataframe(pd.DataFrame(metrics.stage_summary(), columns=["stage", "count", "mean_ms", "p50_ms", "p95_ms"]))
+                    st.markdown("#### 🔢 Counters")
+                    st.dataframe(pd.DataFrame([(name, ", ".join(f"{k}={v}" for k, v in labels.items()), value) for name, kind, _, labels, value in metrics.REGISTRY.samples()
+                                               if kind != "histogram"], columns=["metric", "labels", "value"]))
+
+                if show_records:
+                    if not storage.flush_writes(storage.FLUSH_TIMEOUT):  # include predictions still queued
+                        st.warning("The database is busy; the latest predictions may be missing below.")
+
+                    # Filters
+                    f1, f2, f3, f4 = st.columns([1, 1, 0.7, 0.5])
+                    user_filter = f1.text_input("User", key="records_user").strip() or None
+                    date_range = f2.date_input("Date range", value=(), key="records_dates")
+                    bucket = f3.selectbox("Group over time by", list(storage.TIME_BUCKETS), index=1, key="records_bucket")
+                    page_size = f4.selectbox("Rows", [25, 50, 100, 500], key="records_page_size")
+                    start = date_range[0].strftime("%Y-%m-%d") if len(date_range) > 0 else None
+                    end = (date_range[1] + timedelta(days=1)).strftime("%Y-%m-%d") if len(date_range) > 1 else None
+
+                    # Keyset pagination: keep the cursor of every page visited so far
+                    filters = (user_filter, start, end, page_size)
+                    if st.session_state.get("records_filters") != filters:
+                        st.session_state.records_filters = filters
+                        st.session_state.records_cursors = [None]
+                    cursors = st.session_state.records_cursors
+
+                    with metrics.timed("admin_query"):
+                        rows, next_cursor = storage.query_sentiment(user_filter, start, end, after=cursors[-1], limit=page_size)
+                    data_df = pd.DataFrame(rows, columns=storage.SENTIMENT_COLUMNS)
+                    data_df["prediction"] = data_df["prediction"].apply(storage.normalize_prediction)
+                    st.dataframe(data_df)
+
+                    p1, p2, p3 = st.columns([1, 1, 1])
+                    with p1:
+                        st.button("⬅️ Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+                    p2.markdown(f"Page {len(cursors)}")
+                    with p3:
+                        st.button("Next ➡️", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
+
+                    # Charts come from SQL aggregates, not raw rows
+                    with metrics.timed("admin_query"):
+                        counts = storage.sentiment_counts(user_filter, start, end)
+                    if counts:
+                        st.plotly_chart(sentiment_pie(tuple(counts.items())))
+                        with metrics.timed("admin_query"):
+                            over_time = storage.sentiment_over_time(bucket, user_filter, start, end)
+                        st.plotly_chart(sentiment_bar(tuple(over_time)))
+
+                        # Word clouds from the precomputed per-day/per-user word_counts table
+                        if st.checkbox("Show word clouds", key="records_wordclouds"):
+                            import wordclouds
+                            with metrics.timed("wordcloud"):
+                                wordclouds.refresh_word_counts(model.tokens)
+                                show_wordclouds(wordclouds.stored_sentiment_clouds(user_filter, start, end), "Predictions")
+            else:
+                st.info("Only authorized users can view stored sentiment history.")
+
+    records_section()
+
+    # Keyword search over every stored text (FTS5 index, see storage.search_sentiment)
+    @st.fragment
+    def search_section():
+        col1, col2, col3 = st.columns([0.1,1,0.1])
+        with col2:
+            current_user = st.session_state.get("current_user", None)
+            if current_user in AUTHORIZED_ADMINS:
+                import pandas as pd
+                st.markdown("### 🔎 Search Stored Predictions")
+                s1, s2, s3, s4 = st.columns([1.4, 0.6, 0.8, 1])
+                query = s1.text_input("Keywords (all must match, word* for a prefix)", key="search_query")
+                prediction = s2.selectbox("Sentiment", ["Any", "Positive", "Negative"], key="search_prediction")
+                search_user = s3.text_input("User", key="search_user").strip() or None
+                search_dates = s4.date_input("Date range", value=(), key="search_dates")
+                search_start = search_dates[0].strftime("%Y-%m-%d") if len(search_dates) > 0 else None
+                search_end = (search_dates[1] + timedelta(days=1)).strftime("%Y-%m-%d") if len(search_dates) > 1 else None
+
+                if query.strip():
+                    if not storage.flush_writes(storage.FLUSH_TIMEOUT):  # include predictions still queued
+                        st.warning("The database is busy; the latest predictions may be missing below.")
+                    filters = (query, prediction, search_user, search_start, search_end)
+                    if st.session_state.get("search_filters") != filters:
+                        st.session_state.search_filters = filters
+                        st.session_state.search_cursors = [None]
+                    cursors = st.session_state.search_cursors
+
+                    with metrics.timed("search"):
+                        rows, next_cursor = storage.search_sentiment(
+                            query, None if prediction == "Any" else prediction, search_user, search_start,
+                            search_end, after=cursors[-1], limit=50)
+                    if rows:
+                        results_df = pd.DataFrame(rows, columns=storage.SENTIMENT_COLUMNS)
+                        results_df["prediction"] = results_df["prediction"].apply(storage.normalize_prediction)
+                        st.dataframe(results_df)
+                    else:
+                        st.info("No stored predictions match.")
+
+                    p1, p2, p3 = st.columns([1, 1, 1])
+                    with p1:
+                        st.button("⬅️ Previous", key="search_previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+                    p2.markdown(f"Page {len(cursors)}")
+                    with p3:
+                        st.button("Next ➡️", key="search_next", disabled=next_cursor is None,
+                                  on_click=cursors.append, args=(next_cursor,))
+
+    search_section()
 
     # Download CSV
-    col1, col2, col3 = st.columns([0.1,1,0.1])
-    with col2:
-        current_user = st.session_state.get("current_user", None)
-        if current_user in AUTHORIZED_ADMINS:
-            if st.button(" Download Sentiment Data as CSV"):
-                data_df = pd.read_sql_query("SELECT * FROM sentiment_data", conn)
-                csv = data_df.to_csv(index=False).encode('utf-8')
-                st.download_button("Download CSV", csv, "sentiment_data.csv", "text/csv")
-        else:
-            st.info("Only authorized users can download sentiment history.")
+    @st.fragment
+    def export_section():
+        col1, col2, col3 = st.columns([0.1,1,0.1])
+        with col2:
+            current_user = st.session_state.get("current_user", None)
+            if current_user in AUTHORIZED_ADMINS:
+                e1, e2, e3 = st.columns([1, 1, 0.6])
+                export_user = e1.text_input("Export user", key="export_user").strip() or None
+                export_dates = e2.date_input("Export date range", value=(), key="export_dates")
+                export_format = e3.selectbox("Format", export.available_formats(), key="export_format")
+                export_start = export_dates[0].strftime("%Y-%m-%d") if len(export_dates) > 0 else None
+                export_end = (export_dates[1] + timedelta(days=1)).strftime("%Y-%m-%d") if len(export_dates) > 1 else None
+
+                def build_export():
+                    # runs only when the button is clicked; streams the table to a
+                    # temp file in chunks instead of building a DataFrame
+                    out = tempfile.TemporaryFile()
+                    export.write_export(out, export_format, export_user, export_start, export_end)
+                    out.seek(0)
+                    return out
+
+                st.download_button(" Download Sentiment Data", build_export, f"sentiment_data.{export_format}",
+                                   export.FORMATS[export_format])
+            else:
+                st.info("Only authorized users can download sentiment history.")
+
+    export_section()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
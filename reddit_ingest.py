@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import inference
+import storage
+
+# ----------------------------
+# REDDIT CONFIG
+# ----------------------------
+CLIENT_ID = os.environ.get("REDDIT_CLIENT_ID", "maLH-M6awZujpG7uOFz0fQ")
+CLIENT_SECRET = os.environ.get("REDDIT_CLIENT_SECRET", "8R2sqWZG7x2yvgxVYEZ_IxsPe3_NkQ")
+USER_AGENT = "SentimentAnalysisApp"
+
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 100 / 60  # Reddit's OAuth allowance: 100 requests per minute
+BURST = 10
+LISTING_PAGE_SIZE = 100  # Reddit returns at most 100 items per listing request
+
+
+# ----------------------------
+# RATE LIMITING
+# ----------------------------
+class TokenBucket:
+    # Shared by every fetch thread. Tokens refill at `rate` per second up to
+    # `capacity`; after each response the bucket is clamped to the quota
+    # Reddit reports in its x-ratelimit-* headers, and drained until the
+    # window resets when that quota is used up.
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self.waited = 0.0  # total seconds callers spent waiting for a token
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, n=1):
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= n:
+                    self.tokens -= n
+                    self.waited += now - start
+                    return
+                wait = max(self.blocked_until - now, (n - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def update(self, remaining, reset_timestamp):
+        # remaining / reset_timestamp as exposed by praw's reddit.auth.limits
+        if remaining is None:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, remaining)
+            if remaining < 1 and reset_timestamp:
+                self.blocked_until = time.monotonic() + max(0.0, reset_timestamp - time.time())
+
+
+# ----------------------------
+# INGESTION CLIENT
+# ----------------------------
+def post_text(submission):
+    text = submission.title
+    if submission.selftext:
+        text += " " + submission.selftext
+    return text
+
+
+class RedditIngestor:
+    # One per process. praw.Reddit instances are not thread-safe, so each
+    # pool thread lazily builds its own from the same settings and keeps it
+    # for the life of the pool; all of them draw from one TokenBucket.
+
+    def __init__(self, client_id=CLIENT_ID, client_secret=CLIENT_SECRET, user_agent=USER_AGENT,
+                 max_workers=MAX_WORKERS, bucket=None, **praw_kwargs):
+        self.praw_kwargs = dict(client_id=client_id, client_secret=client_secret,
+                                user_agent=user_agent, **praw_kwargs)
+        self.bucket = bucket or TokenBucket()
+        self.requests = 0
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reddit")
+        self._count_lock = threading.Lock()
+
+    def _reddit(self):
+        reddit = getattr(self._local, "reddit", None)
+        if reddit is None:
+            import praw  # ~120 ms to import; only paid once a Reddit fetch is made
+
+            reddit = self._local.reddit = praw.Reddit(**self.praw_kwargs)
+        return reddit
+
+    def _listing(self, make_listing, limit):
+        reddit = self._reddit()
+        pages = max(1, -(-limit // LISTING_PAGE_SIZE))
+        self.bucket.acquire(pages)
+        posts = [{"id": s.id, "text": post_text(s), "created_utc": s.created_utc}
+                 for s in make_listing(reddit)]
+        limits = reddit.auth.limits
+        self.bucket.update(limits.get("remaining"), limits.get("reset_timestamp"))
+        with self._count_lock:
+            self.requests += pages
+        return posts
+
+    def fetch_redditor_posts(self, name, limit=5, params=None):
+        # newest first: [{"id", "text", "created_utc"}]
+        return self._listing(lambda r: r.redditor(name).submissions.new(limit=limit, params=params or {}), limit)
+
+    def fetch_subreddit_posts(self, name, limit=5, params=None):
+        return self._listing(lambda r: r.subreddit(name).new(limit=limit, params=params or {}), limit)
+
+    def fetch_many(self, redditors=(), subreddits=(), limit=5):
+        # Fetches every source concurrently. Returns {source: posts} with
+        # sources named "u/<name>" / "r/<name>"; a failed source maps to the
+        # exception instead of a list.
+        futures = {}
+        for name in redditors:
+            futures[f"u/{name}"] = self._pool.submit(self.fetch_redditor_posts, name, limit)
+        for name in subreddits:
+            futures[f"r/{name}"] = self._pool.submit(self.fetch_subreddit_posts, name, limit)
+        return self._gather(futures)
+
+    def fetch_since_last(self, redditors=(), subreddits=(), limit=5, db_path=storage.DB_PATH):
+        # Like fetch_many, but backed by the reddit_posts table: a source seen
+        # before only asks Reddit for submissions newer than its stored
+        # high-water mark, usually one small listing call. Returns the
+        # `limit` newest stored posts per source with any cached prediction.
+        futures = {}
+        for kind, names in (("u", redditors), ("r", subreddits)):
+            for name in names:
+                source = f"{kind}/{name.lower()}"  # Reddit names are case-insensitive
+                futures[source] = self._pool.submit(self._refresh_source, kind, name, source, limit, db_path)
+        return self._gather(futures)
+
+    def _refresh_source(self, kind, name, source, limit, db_path):
+        fetch = self.fetch_redditor_posts if kind == "u" else self.fetch_subreddit_posts
+        newest = storage.reddit_high_water_mark(source, db_path)
+        posts = fetch(name, limit, params={"before": f"t3_{newest}"} if newest else None)
+        if newest and (not posts or len(posts) >= limit):
+            # Take the newest page instead (stored posts are deduplicated by
+            # id). More new posts than fit in one call: `before` pages from
+            # the mark upwards. None: either nothing is new, or the mark was
+            # deleted or removed, which Reddit also answers with an empty
+            # listing, and the source would never see a new post again.
+            posts = fetch(name, limit)
+        storage.store_reddit_posts(source, posts, db_path)
+        return storage.recent_reddit_posts(source, limit, db_path)
+
+    def _gather(self, futures):
+        results = {}
+        for source, future in futures.items():
+            try:
+                results[source] = future.result()
+            except Exception as e:
+                results[source] = e
+        return results
+
+
+def score_cached_posts(posts_by_source, scorer, db_path=storage.DB_PATH):
+    # Fills in "prediction"/"score" on posts from fetch_since_last. Only
+    # posts never scored, or scored by another model version, go through
+    # the model (in one batch); their results are written back to the cache.
+    stale = [(source, post) for source, posts in posts_by_source.items() if isinstance(posts, list)
+             for post in posts if post["prediction"] is None or post["model_version"] != scorer.version]
+    if not stale:
+        return 0
+    predictions, scores = inference.cached_predict_batch(scorer, [post["text"] for _, post in stale])
+    updates = {}
+    for (source, post), prediction, score in zip(stale, predictions, scores):
+        post["prediction"], post["score"], post["model_version"] = int(prediction), float(score), scorer.version
+        updates.setdefault(source, []).append((post["id"], prediction, score))
+    for source, rows in updates.items():
+        storage.store_reddit_predictions(source, rows, scorer.version, db_path)
+    return len(stale)
+
+
+def parse_sources(text):
+    # "alice, u/bob, r/python" -> (["alice", "bob"], ["python"])
+    redditors, subreddits = [], []
+    for name in (part.strip() for part in text.split(",")):
+        if name.startswith("r/"):
+            subreddits.append(name[2:])
+        elif name:
+            redditors.append(name[2:] if name.startswith("u/") else name)
+    return redditors, subreddits
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = RedditIngestor()
+        return _ingestor
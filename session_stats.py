@@ -0,0 +1,36 @@
+from collections import deque
+
+# ----------------------------
+# SESSION SENTIMENT
+# ----------------------------
+# What one browser session has analyzed, in constant memory: a count per
+# label and a ring buffer of the most recent raw scores for the trend
+# chart. A session that scores thousands of Reddit posts holds the same
+# two counters and at most RECENT_SCORES floats.
+LABELS = ("Positive", "Negative")
+RECENT_SCORES = 200
+
+
+class SessionStats:
+    __slots__ = ("counts", "recent", "total")
+
+    def __init__(self, maxlen=RECENT_SCORES):
+        self.counts = dict.fromkeys(LABELS, 0)
+        self.recent = deque(maxlen=maxlen)  # (n, score), oldest dropped first
+        self.total = 0
+
+    def add(self, label, score=None):
+        # label: "Positive"/"Negative", or a display string containing one
+        label = "Positive" if "Positive" in label else "Negative"
+        self.counts[label] += 1
+        self.total += 1
+        if score is not None:
+            self.recent.append((self.total, float(score)))
+
+    def shares(self):
+        # [(label, count, share)] largest first, labels with no predictions left out
+        return [(label, n, n / self.total)
+                for label, n in sorted(self.counts.items(), key=lambda item: -item[1]) if n]
+
+    def __len__(self):
+        return self.total
@@ -0,0 +1,1076 @@
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import metrics
+
+# ----------------------------
+# GLOBAL CONFIG
+# ----------------------------
+DB_PATH = os.environ.get("SENTIMINDS_DB", "senti.db")  # read once, at import
+POOL_SIZE = 4
+WRITE_BATCH_SIZE = 500     # rows per executemany transaction
+WRITE_FLUSH_INTERVAL = 0.5  # seconds a queued row may wait before it is written
+WRITE_RETRY_MAX_DELAY = 5.0  # backoff cap while the database stays locked
+WRITE_RETRY_SECONDS = 300    # a batch still locked out after this is dropped
+FLUSH_TIMEOUT = 2.0          # how long interactive readers wait for queued rows
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",    # readers don't block the writer
+    "PRAGMA synchronous=NORMAL",  # fsync at checkpoints, not every commit
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",   # 16 MB page cache per connection
+)
+
+log = logging.getLogger(__name__)
+
+DB_COMMITS = metrics.REGISTRY.counter("sentiminds_db_commits_total", "sentiment_data write transactions")
+DB_ROWS = metrics.REGISTRY.counter("sentiminds_db_rows_written_total", "sentiment_data rows inserted")
+DB_WRITE_ERRORS = metrics.REGISTRY.counter("sentiminds_db_write_errors_total", "Failed write-behind batches")
+DB_WRITE_RETRIES = metrics.REGISTRY.counter("sentiminds_db_write_retries_total",
+                                            "Write-behind batches retried because the database was locked")
+DB_COMMIT_SECONDS = metrics.REGISTRY.histogram("sentiminds_db_commit_seconds", "Time to insert and commit one batch")
+
+
+# ----------------------------
+# CONNECTION POOL
+# ----------------------------
+class ConnectionPool:
+    # A fixed set of connections shared by every session in the process.
+    # Streamlit runs sessions on different threads, so connections are
+    # opened with check_same_thread=False and checked out one at a time.
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(self._open())
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path)
+        return _pools[db_path]
+
+
+def connection(db_path=DB_PATH):
+    return get_pool(db_path).connection()
+
+
+# ----------------------------
+# DATABASE
+# ----------------------------
+# The schema is built by numbered migrations, each applied once per
+# database and recorded in schema_migrations. Every step is idempotent
+# (IF NOT EXISTS / missing-column checks) so databases created before the
+# table existed are brought up to date by replaying them. Append new
+# steps; never edit or renumber an applied one.
+def _migrate_base_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT
+    )''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS sentiment_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        text TEXT,
+        prediction TEXT,
+        confidence REAL,
+        timestamp TEXT
+    )''')
+
+    # admin views filter by time and user and group by prediction
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_timestamp ON sentiment_data (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_user_timestamp ON sentiment_data (username, timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_prediction ON sentiment_data (prediction)")
+
+
+def _migrate_reddit_posts(c):
+    # fetched Reddit submissions, reused by later analyses of the same source
+    c.execute('''CREATE TABLE IF NOT EXISTS reddit_posts (
+        source TEXT,
+        id TEXT,
+        text TEXT,
+        created_utc REAL,
+        fetched_at REAL,
+        prediction INTEGER,
+        score REAL,
+        model_version TEXT,
+        PRIMARY KEY (source, id)
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reddit_posts_source_created ON reddit_posts (source, created_utc)")
+
+
+def _migrate_model_columns(c):
+    # added after release: the model's normalized label and raw score and
+    # the model that produced them (NULL on rows not yet backfilled)
+    _add_missing_columns(c, "sentiment_data", SENTIMENT_MODEL_COLUMNS)
+
+
+MIGRATIONS = (
+    (1, "users and sentiment_data", _migrate_base_tables),
+    (2, "sentiment rollups", lambda c: create_rollup_tables(c)),
+    (3, "reddit_posts", _migrate_reddit_posts),
+    (4, "sentiment_data label, score, model_version", _migrate_model_columns),
+    (5, "backfill_progress", lambda c: create_backfill_tables(c)),
+    (6, "word_counts", lambda c: create_word_count_tables(c)),
+    (7, "sentiment_fts full-text index", lambda c: create_search_index(c)),
+    (8, "texts and predictions", lambda c: migrate_compact_storage(c)),
+)
+
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def create_main_tables(db_path=DB_PATH):
+    # Brings the schema up to date. Only the first call per database in a
+    # process touches it; the rest (every Streamlit rerun, every CLI step)
+    # return after a set lookup.
+    if db_path in _migrated:
+        return
+    with _migrate_lock:
+        if db_path not in _migrated:
+            with connection(db_path) as conn:
+                migrate(conn)
+            _migrated.add(db_path)
+
+
+def migrate(conn, target=None):
+    # Applies pending MIGRATIONS on `conn`, one transaction each, up to
+    # `target` (default: all). Returns the versions applied.
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TEXT
+    )''')
+    conn.commit()
+    applied = []
+    for version, name, apply in MIGRATIONS:
+        if version <= schema_version(conn) or (target is not None and version > target):
+            continue
+        # IMMEDIATE takes the write lock before re-checking, so two processes
+        # starting together don't both apply the same step
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version > schema_version(conn):
+                apply(conn.cursor())
+                conn.execute("INSERT INTO schema_migrations VALUES (?, ?, ?)",
+                             (version, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                applied.append(version)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    if applied:
+        log.info("Applied schema migrations %s", applied)
+    return applied
+
+
+def schema_version(conn):
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+
+@contextmanager
+def write_transaction(conn):
+    # BEGIN IMMEDIATE takes the write lock up front, so what the transaction
+    # reads can't change before it writes
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _add_missing_columns(c, table, columns):
+    # ADD COLUMN only touches the schema, not the rows, so this is instant
+    # even on a large table
+    existing = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def add_user(username, password, db_path=DB_PATH):
+    with connection(db_path) as conn:
+        conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (username, password))
+        conn.commit()
+
+
+def verify_user(username, password, db_path=DB_PATH):
+    with connection(db_path) as conn:
+        c = conn.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
+        data = c.fetchone()
+    return data is not None
+
+
+# ----------------------------
+# QUERIES (admin views)
+# ----------------------------
+SENTIMENT_COLUMNS = ("id", "username", "text", "prediction", "confidence", "timestamp")
+SENTIMENT_MODEL_COLUMNS = {"label": "TEXT", "score": "REAL", "model_version": "TEXT"}
+TIME_BUCKETS = {"minute": 16, "hour": 13, "day": 10}  # prefix length of "YYYY-MM-DD HH:MM:SS"
+LABELS = ("Negative", "Positive")  # predictions.label is the index
+
+
+def normalize_prediction(prediction):
+    # the text path stores "😊 Positive", the Reddit path bare "Positive"
+    return "Positive" if "Positive" in prediction else "Negative"
+
+
+def label_id(prediction):
+    # any prediction string -> its index in LABELS
+    return LABELS.index(normalize_prediction(prediction))
+
+
+def to_epoch(timestamp):
+    # "YYYY-MM-DD[ HH:MM:SS]" in local time, like the stored timestamps
+    # used to be, -> epoch seconds; ints pass through
+    if isinstance(timestamp, int):
+        return timestamp
+    return int(datetime.fromisoformat(timestamp).timestamp())
+
+
+def _filters(username=None, start=None, end=None):
+    # start is inclusive, end exclusive; both "YYYY-MM-DD[ HH:MM:SS]" strings
+    clauses, params = [], []
+    if username:
+        clauses.append("username = ?")
+        params.append(username)
+    if start:
+        clauses.append("ts >= ?")
+        params.append(to_epoch(start))
+    if end:
+        clauses.append("ts < ?")
+        params.append(to_epoch(end))
+    return clauses, params
+
+
+def query_sentiment(username=None, start=None, end=None, after=None, limit=100, db_path=DB_PATH):
+    # Newest first, keyset-paginated on (ts, id): pass the returned cursor
+    # as `after` to get the next page. Returns (rows, next_cursor);
+    # next_cursor is None on the last page.
+    clauses, params = _filters(username, start, end)
+    if after is not None:
+        clauses.append("(ts, id) < (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = (f"SELECT {', '.join(SENTIMENT_COLUMNS)}, ts FROM sentiment_data {where} "
+           "ORDER BY ts DESC, id DESC LIMIT ?")
+    with connection(db_path) as conn:
+        rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    cursor = (rows[limit - 1][-1], rows[limit - 1][0]) if len(rows) > limit else None
+    return [dict(zip(SENTIMENT_COLUMNS, row)) for row in rows[:limit]], cursor
+
+
+def sentiment_counts(username=None, start=None, end=None, db_path=DB_PATH):
+    # {label: count}; read from the rollup table at the coarsest grain that
+    # matches the filter boundaries, otherwise scanned from sentiment_data
+    for grain in ("day", "hour", "minute"):
+        bounds = _rollup_bounds(grain, start, end)
+        if bounds is not None:
+            sql, params = _rollup_query("label, SUM(count)", grain, username, bounds)
+            with connection(db_path) as conn:
+                return dict(conn.execute(sql + " GROUP BY label", params).fetchall())
+    return _scan_counts(username, start, end, db_path)
+
+
+def sentiment_over_time(bucket="hour", username=None, start=None, end=None, db_path=DB_PATH):
+    # [(bucket, label, count)] sorted by bucket
+    bounds = _rollup_bounds(bucket, start, end)
+    if bounds is None:
+        return _scan_over_time(bucket, username, start, end, db_path)
+    sql, params = _rollup_query("bucket, label, count", bucket, username, bounds)
+    with connection(db_path) as conn:
+        return conn.execute(sql + " ORDER BY bucket, label", params).fetchall()
+
+
+def _scan_counts(username=None, start=None, end=None, db_path=DB_PATH):
+    # label is 0/1, so one pass over the covering index counts both
+    clauses, params = _filters(username, start, end)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with connection(db_path) as conn:
+        positive, total = conn.execute(f"SELECT SUM(label), COUNT(*) FROM sentiment_data {where}", params).fetchone()
+    counts = {"Positive": positive or 0, "Negative": total - (positive or 0)}
+    return {label: count for label, count in counts.items() if count}
+
+
+def _scan_slot_seconds(bucket):
+    # The widest epoch-second slot that never straddles two local buckets:
+    # UTC offsets are whole hours in most zones, quarter hours in all
+    if bucket == "minute":
+        return 60
+    return 3600 if time.timezone % 3600 == 0 and time.altzone % 3600 == 0 else 900
+
+
+def _scan_over_time(bucket="hour", username=None, start=None, end=None, db_path=DB_PATH):
+    # Counts per integer time slot first, then turns each slot (not each
+    # row) into its local "YYYY-MM-DD HH" style bucket
+    width, step = TIME_BUCKETS[bucket], _scan_slot_seconds(bucket)
+    clauses, params = _filters(username, start, end)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = (f"SELECT substr(datetime(slot * {step}, 'unixepoch', 'localtime'), 1, {width}) AS bucket, "
+           "SUM(positive), SUM(n) FROM ("
+           f"SELECT ts / {step} AS slot, SUM(label) AS positive, COUNT(*) AS n FROM sentiment_data {where} "
+           "GROUP BY slot) GROUP BY bucket ORDER BY bucket")
+    with connection(db_path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [(b, label, count) for b, positive, total in rows
+            for label, count in (("Negative", total - positive), ("Positive", positive)) if count]
+
+
+def iter_sentiment_chunks(username=None, start=None, end=None, chunk_size=5000, db_path=DB_PATH, after_id=0):
+    # Yields lists of row tuples (SENTIMENT_COLUMNS order) in id order. Each
+    # chunk is its own short keyset query, so an export holds one chunk in
+    # memory and never keeps a read transaction open between chunks.
+    clauses, params = _filters(username, start, end)
+    clauses.append("id > ?")
+    sql = (f"SELECT {', '.join(SENTIMENT_COLUMNS)} FROM sentiment_data "
+           f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?")
+    last_id = after_id
+    while True:
+        with connection(db_path) as conn:
+            rows = conn.execute(sql, params + [last_id, chunk_size]).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+# ----------------------------
+# REDDIT POST CACHE
+# ----------------------------
+REDDIT_POST_COLUMNS = ("id", "text", "created_utc", "prediction", "score", "model_version")
+
+
+def reddit_high_water_mark(source, db_path=DB_PATH):
+    # id of the newest stored submission for a source ("u/name" / "r/name")
+    with connection(db_path) as conn:
+        row = conn.execute("SELECT id FROM reddit_posts WHERE source = ? ORDER BY created_utc DESC LIMIT 1",
+                           (source,)).fetchone()
+    return row[0] if row else None
+
+
+def store_reddit_posts(source, posts, db_path=DB_PATH):
+    # posts as returned by RedditIngestor; keeps any cached prediction
+    fetched_at = time.time()
+    with connection(db_path) as conn:
+        with conn:
+            conn.executemany(
+                "INSERT INTO reddit_posts (source, id, text, created_utc, fetched_at) VALUES (?,?,?,?,?) "
+                "ON CONFLICT (source, id) DO UPDATE SET text = excluded.text, fetched_at = excluded.fetched_at",
+                [(source, p["id"], p["text"], p["created_utc"], fetched_at) for p in posts])
+
+
+def recent_reddit_posts(source, limit=5, db_path=DB_PATH):
+    # newest first, with the cached prediction (None if never scored)
+    with connection(db_path) as conn:
+        rows = conn.execute(f"SELECT {', '.join(REDDIT_POST_COLUMNS)} FROM reddit_posts "
+                            "WHERE source = ? ORDER BY created_utc DESC LIMIT ?", (source, limit)).fetchall()
+    return [dict(zip(REDDIT_POST_COLUMNS, row)) for row in rows]
+
+
+def store_reddit_predictions(source, rows, model_version, db_path=DB_PATH):
+    # rows: (post_id, prediction, score)
+    with connection(db_path) as conn:
+        with conn:
+            conn.executemany("UPDATE reddit_posts SET prediction = ?, score = ?, model_version = ? "
+                             "WHERE source = ? AND id = ?",
+                             [(int(p), float(sc), model_version, source, post_id) for post_id, p, sc in rows])
+
+
+# ----------------------------
+# ROLLUPS
+# ----------------------------
+# sentiment_rollup holds prediction counts per (grain, bucket, username,
+# label) for every grain in TIME_BUCKETS. Triggers keep it in step with
+# every insert, delete and update on predictions (sentiment_data before
+# migration 8), whichever code path writes it. Rows with username
+# ALL_USERS count every user, so the admin charts read a few hundred rows
+# instead of scanning the history.
+ALL_USERS = "*"  # cannot clash: usernames must start with a letter
+_LABEL_SQL = "CASE WHEN instr(COALESCE({row}.prediction, ''), 'Positive') > 0 THEN 'Positive' ELSE 'Negative' END"
+_TIMESTAMP_SQL = "COALESCE({row}.timestamp, '')"
+_TIMESTAMP_TEMPLATE = "0000-00-00 00:00:00"
+
+
+def _rollup_upserts(row, delta, timestamp_sql=_TIMESTAMP_SQL, label_sql=_LABEL_SQL):
+    statements = []
+    for grain, width in TIME_BUCKETS.items():
+        for user in (f"COALESCE({row}.username, '')", f"'{ALL_USERS}'"):
+            statements.append(
+                "INSERT INTO sentiment_rollup (grain, bucket, username, label, count) "
+                f"VALUES ('{grain}', substr({timestamp_sql.format(row=row)}, 1, {width}), {user}, "
+                f"{label_sql.format(row=row)}, {delta}) "
+                f"ON CONFLICT (grain, bucket, username, label) DO UPDATE SET count = count + ({delta});")
+    return "\n".join(statements)
+
+
+def _create_rollup_table(c):
+    # returns whether the table already existed
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sentiment_rollup'").fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS sentiment_rollup (
+        grain TEXT,
+        bucket TEXT,
+        username TEXT,
+        label TEXT,
+        count INTEGER,
+        PRIMARY KEY (grain, username, bucket, label)
+    ) WITHOUT ROWID''')
+    return exists is not None
+
+
+def create_rollup_tables(c):
+    exists = _create_rollup_table(c)
+
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sentiment_rollup_insert
+        AFTER INSERT ON sentiment_data BEGIN
+        {_rollup_upserts("NEW", 1)}
+        END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sentiment_rollup_delete
+        AFTER DELETE ON sentiment_data BEGIN
+        {_rollup_upserts("OLD", -1)}
+        END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sentiment_rollup_update
+        AFTER UPDATE OF username, prediction, timestamp ON sentiment_data BEGIN
+        {_rollup_upserts("OLD", -1)}
+        {_rollup_upserts("NEW", 1)}
+        END""")
+
+    if not exists:
+        rebuild_rollups(c)
+
+
+def rebuild_rollups(c):
+    # one-off full recount, e.g. for a database created before the rollups
+    c.execute("DELETE FROM sentiment_rollup")
+    label = _LABEL_SQL.format(row="sentiment_data")
+    for grain, width in TIME_BUCKETS.items():
+        for user in ("COALESCE(username, '')", f"'{ALL_USERS}'"):
+            c.execute(f"INSERT INTO sentiment_rollup (grain, bucket, username, label, count) "
+                      f"SELECT '{grain}', substr(COALESCE(timestamp, ''), 1, {width}) AS b, {user} AS u, "
+                      f"{label} AS l, COUNT(*) FROM sentiment_data GROUP BY b, u, l")
+
+
+def _rollup_bounds(grain, start, end):
+    # Bucket-prefix bounds for the filter range, or None when a boundary
+    # falls inside a bucket of this grain and the rollup can't answer it.
+    width = TIME_BUCKETS[grain]
+    bounds = []
+    for ts in (start, end):
+        if ts:
+            ts = ts + _TIMESTAMP_TEMPLATE[len(ts):]
+            if ts[width:] != _TIMESTAMP_TEMPLATE[width:]:
+                return None
+            ts = ts[:width]
+        bounds.append(ts or None)
+    return bounds
+
+
+def _rollup_query(columns, grain, username, bounds):
+    sql = f"SELECT {columns} FROM sentiment_rollup WHERE grain = ? AND username = ? AND count > 0"
+    params = [grain, username or ALL_USERS]
+    if bounds[0]:
+        sql += " AND bucket >= ?"
+        params.append(bounds[0])
+    if bounds[1]:
+        sql += " AND bucket < ?"
+        params.append(bounds[1])
+    return sql, params
+
+
+# ----------------------------
+# WRITE-BEHIND QUEUE
+# ----------------------------
+INSERT_PREDICTION = ("INSERT INTO predictions (username, text_id, label, confidence, ts, score, model_version) "
+                     "VALUES (?,?,?,?,?,?,?)")
+
+
+class WriteBehindQueue:
+    # Predictions are queued and written by one background thread with
+    # executemany, one transaction per batch_size rows or flush_interval
+    # seconds, instead of one commit (and fsync) per prediction. A batch
+    # that finds the database locked past busy_timeout (a VACUUM, a long
+    # backfill chunk) is retried with backoff for up to WRITE_RETRY_SECONDS;
+    # other errors, and a lock held longer than that, drop it.
+
+    def __init__(self, db_path=DB_PATH, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sentiment-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, row):
+        self._queue.put(row)
+
+    def flush(self, timeout=None):
+        # blocks until every row queued before the call is committed
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch, markers = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write(batch)
+            except Exception:  # never let one batch stop the writer
+                DB_WRITE_ERRORS.inc()
+                log.exception("Failed to write %d sentiment rows", len(batch))
+            for marker in markers:
+                marker.set()
+
+    def _write(self, batch):
+        delay, give_up = 0.1, time.monotonic() + WRITE_RETRY_SECONDS
+        while True:
+            try:
+                _insert(batch, self.db_path)
+                break
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e) or time.monotonic() + delay > give_up:
+                    raise
+                DB_WRITE_RETRIES.inc()
+                log.warning("Database locked, retrying %d sentiment rows in %.1fs", len(batch), delay)
+                time.sleep(delay)
+                delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+        self.rows_written += len(batch)
+        self.commits += 1
+
+
+def _is_locked(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+_writers = {}
+
+
+def get_writer(db_path=DB_PATH):
+    with _pools_lock:
+        if db_path not in _writers:
+            _writers[db_path] = WriteBehindQueue(db_path)
+        return _writers[db_path]
+
+
+def save_to_db(username, text, prediction, confidence, db_path=DB_PATH, score=None, model_version=None):
+    # timestamp is taken now, not when the queue is flushed
+    get_writer(db_path).put((username, text, label_id(prediction), confidence, int(time.time()),
+                             score, model_version))
+
+
+def insert_sentiment_rows(rows, db_path=DB_PATH):
+    # Synchronous bulk insert in one transaction, for producers that must
+    # not outrun the database (bulk upload, backfills): the write-behind
+    # queue would buffer their whole backlog in memory.
+    # rows: (username, text, prediction, confidence, timestamp, score, model_version),
+    # timestamp in epoch seconds or a to_epoch string
+    _insert([(u, t, label_id(p), c, to_epoch(ts), s, v) for u, t, p, c, ts, s, v in rows], db_path)
+
+
+def _insert(rows, db_path):
+    # rows: (username, text, label, confidence, ts, score, model_version)
+    start = time.perf_counter()
+    with connection(db_path) as conn:
+        with write_transaction(conn):
+            text_ids = store_texts(conn, [row[1] for row in rows])
+            conn.executemany(INSERT_PREDICTION, [(u, text_id, *rest)
+                                                 for (u, _, *rest), text_id in zip(rows, text_ids)])
+    DB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+    DB_COMMITS.inc()
+    DB_ROWS.inc(len(rows))
+
+
+def flush_writes(timeout=None):
+    # True once every queued row is committed, False if `timeout` seconds
+    # passed first (e.g. while compact.py --vacuum holds the write lock);
+    # readers then go ahead without the rows still queued
+    deadline = None if timeout is None else time.monotonic() + timeout
+    flushed = True
+    for writer in list(_writers.values()):
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        flushed = writer.flush(remaining) and flushed
+    return flushed
+
+
+atexit.register(flush_writes, 5)
+
+
+# ----------------------------
+# MODEL BACKFILL
+# ----------------------------
+# Re-scoring sentiment_data after a model change (see backfill.py). Progress
+# is checkpointed per target model version in the same transaction as each
+# chunk's updates, so an interrupted run resumes after the last committed
+# chunk. Chunks are short write transactions: the write-behind queue's
+# inserts interleave with them and readers are never blocked (WAL).
+def create_backfill_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS backfill_progress (
+        model_version TEXT PRIMARY KEY,
+        last_id INTEGER,
+        rows_updated INTEGER,
+        started_at TEXT,
+        updated_at TEXT,
+        finished_at TEXT
+    )''')
+
+
+def backfill_checkpoint(model_version, db_path=DB_PATH):
+    with connection(db_path) as conn:
+        row = conn.execute("SELECT last_id, rows_updated, started_at, updated_at, finished_at "
+                           "FROM backfill_progress WHERE model_version = ?", (model_version,)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(("last_id", "rows_updated", "started_at", "updated_at", "finished_at"), row))
+
+
+def count_stale_rows(model_version, db_path=DB_PATH):
+    with connection(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM sentiment_data WHERE model_version IS NOT ?",
+                            (model_version,)).fetchone()[0]
+
+
+def stale_sentiment_rows(model_version, after_id=0, limit=500, db_path=DB_PATH):
+    # [(id, text)] not yet scored by model_version, in id order
+    with connection(db_path) as conn:
+        return conn.execute("SELECT id, text FROM sentiment_data WHERE id > ? AND model_version IS NOT ? "
+                            "ORDER BY id LIMIT ?", (after_id, model_version, limit)).fetchall()
+
+
+def apply_backfill_chunk(model_version, updates, last_id, db_path=DB_PATH):
+    # updates: (label, score, confidence, id); a changed label moves the
+    # row between rollup buckets via the update trigger. Rows compact.py
+    # hasn't moved yet are updated in place, prediction rewritten to the
+    # bare label.
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with connection(db_path) as conn:
+        with write_transaction(conn):
+            conn.executemany("UPDATE predictions SET label = ?, score = ?, confidence = ?, model_version = ? "
+                             "WHERE id = ?",
+                             [(label_id(label), score, confidence, model_version, row_id)
+                              for label, score, confidence, row_id in updates])
+            if _has_legacy_table(conn):
+                conn.executemany("UPDATE sentiment_legacy SET prediction = ?, label = ?, score = ?, confidence = ?, "
+                                 "model_version = ? WHERE id = ?",
+                                 [(label, label, score, confidence, model_version, row_id)
+                                  for label, score, confidence, row_id in updates])
+            conn.execute("INSERT INTO backfill_progress (model_version, last_id, rows_updated, started_at, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?) ON CONFLICT (model_version) DO UPDATE SET "
+                         "last_id = excluded.last_id, rows_updated = rows_updated + excluded.rows_updated, "
+                         "updated_at = excluded.updated_at, finished_at = NULL",
+                         (model_version, last_id, len(updates), now, now))
+
+
+def finish_backfill(model_version, db_path=DB_PATH):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute("INSERT INTO backfill_progress (model_version, last_id, rows_updated, started_at, updated_at, "
+                         "finished_at) VALUES (?, 0, 0, ?, ?, ?) ON CONFLICT (model_version) DO UPDATE SET "
+                         "updated_at = excluded.updated_at, finished_at = excluded.finished_at",
+                         (model_version, now, now, now))
+
+
+# ----------------------------
+# WORD FREQUENCY TABLES
+# ----------------------------
+# Per-day, per-user, per-label word counts for word clouds over stored
+# history (see wordclouds.py). Tokenizing happens in Python, so the table is
+# brought up to date incrementally from a high-water mark on sentiment_data
+# ids rather than by triggers.
+def create_word_count_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS word_counts (
+        day TEXT,
+        username TEXT,
+        label TEXT,
+        word TEXT,
+        count INTEGER,
+        PRIMARY KEY (day, username, label, word)
+    ) WITHOUT ROWID''')
+    c.execute("CREATE TABLE IF NOT EXISTS word_counts_state (id INTEGER PRIMARY KEY CHECK (id = 0), last_id INTEGER)")
+
+
+def word_counts_high_water_mark(db_path=DB_PATH):
+    with connection(db_path) as conn:
+        row = conn.execute("SELECT last_id FROM word_counts_state WHERE id = 0").fetchone()
+    return row[0] if row else 0
+
+
+def add_word_counts(counts, last_id, db_path=DB_PATH):
+    # counts: {(day, username, label, word): n}, committed with the new mark
+    with connection(db_path) as conn:
+        with conn:
+            conn.executemany("INSERT INTO word_counts (day, username, label, word, count) VALUES (?, ?, ?, ?, ?) "
+                             "ON CONFLICT (day, username, label, word) DO UPDATE SET count = count + excluded.count",
+                             [(*key, n) for key, n in counts.items()])
+            conn.execute("INSERT INTO word_counts_state (id, last_id) VALUES (0, ?) "
+                         "ON CONFLICT (id) DO UPDATE SET last_id = excluded.last_id", (last_id,))
+
+
+def clear_word_counts(db_path=DB_PATH):
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute("DELETE FROM word_counts")
+            conn.execute("DELETE FROM word_counts_state")
+
+
+def top_words(label, username=None, start=None, end=None, limit=200, db_path=DB_PATH):
+    # [(word, count)] most frequent first; start/end are day-resolution
+    # "YYYY-MM-DD" bounds like _filters (start inclusive, end exclusive)
+    clauses, params = ["label = ?"], [label]
+    if username:
+        clauses.append("username = ?")
+        params.append(username)
+    if start:
+        clauses.append("day >= ?")
+        params.append(start[:10])
+    if end:
+        clauses.append("day < ?")
+        params.append(end[:10])
+    sql = (f"SELECT word, SUM(count) AS n FROM word_counts WHERE {' AND '.join(clauses)} "
+           "GROUP BY word ORDER BY n DESC LIMIT ?")
+    with connection(db_path) as conn:
+        return conn.execute(sql, params + [limit]).fetchall()
+
+
+# ----------------------------
+# FULL-TEXT SEARCH
+# ----------------------------
+# sentiment_fts is an FTS5 index over the text of each sentiment_data row.
+# It is an external-content table: it stores only the index and reads the
+# text back from sentiment_data, and triggers keep it in step with every
+# insert, delete and text update (on predictions since migration 8). A
+# keyword search walks the index's posting lists newest row first and
+# stops after one page, instead of scanning the table.
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"  # case- and accent-insensitive
+_SEARCH_TABLE_SQL = ("CREATE VIRTUAL TABLE IF NOT EXISTS sentiment_fts USING fts5("
+                     f"text, content='sentiment_data', content_rowid='id', tokenize='{SEARCH_TOKENIZER}')")
+
+
+def create_search_index(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='sentiment_fts'").fetchone()
+
+    c.execute(_SEARCH_TABLE_SQL)
+
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_sentiment_fts_insert
+        AFTER INSERT ON sentiment_data BEGIN
+        INSERT INTO sentiment_fts (rowid, text) VALUES (NEW.id, NEW.text);
+        END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_sentiment_fts_delete
+        AFTER DELETE ON sentiment_data BEGIN
+        INSERT INTO sentiment_fts (sentiment_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+        END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS trg_sentiment_fts_update
+        AFTER UPDATE OF text ON sentiment_data BEGIN
+        INSERT INTO sentiment_fts (sentiment_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+        INSERT INTO sentiment_fts (rowid, text) VALUES (NEW.id, NEW.text);
+        END""")
+
+    if not exists:
+        # index the rows written before the table existed
+        c.execute("INSERT INTO sentiment_fts (sentiment_fts) VALUES ('rebuild')")
+
+
+def fts_query(text):
+    # Keywords as typed -> FTS5 query matching rows that contain every word.
+    # Each word is quoted so FTS5 operators and punctuation are taken
+    # literally; a trailing * keeps its meaning as a prefix search.
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search_sentiment(query, prediction=None, username=None, start=None, end=None, after=None, limit=50,
+                     db_path=DB_PATH):
+    # Rows whose text contains every word of `query`, newest (highest id)
+    # first, optionally limited to a prediction ("Positive"/"Negative"),
+    # user and time range. Keyset-paginated on id like query_sentiment:
+    # returns (rows, next_cursor), next_cursor None on the last page.
+    match = fts_query(query)
+    if not match:
+        return [], None
+    clauses, params = _filters(username, start, end)
+    clauses.insert(0, "sentiment_fts MATCH ?")
+    params.insert(0, match)
+    if prediction:
+        clauses.append("s.label = ?")
+        params.append(label_id(prediction))
+    if after is not None:
+        clauses.append("sentiment_fts.rowid < ?")
+        params.append(after)
+    sql = (f"SELECT {', '.join('s.' + column for column in SENTIMENT_COLUMNS)} "
+           "FROM sentiment_fts JOIN sentiment_data s ON s.id = sentiment_fts.rowid "
+           f"WHERE {' AND '.join(clauses)} ORDER BY sentiment_fts.rowid DESC LIMIT ?")
+    with connection(db_path) as conn:
+        rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    rows = [dict(zip(SENTIMENT_COLUMNS, row)) for row in rows]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, rows[-1]["id"]
+
+
+# ----------------------------
+# COMPACT STORAGE
+# ----------------------------
+# Since migration 8 a prediction is a narrow predictions row: epoch-second
+# ts, integer label (index into LABELS), raw score and the id of its text.
+# Each distinct text is stored once in `texts`, keyed by a 16-byte BLAKE2b
+# digest of its UTF-8 bytes, so analyzing the same post or phrase again
+# adds only the narrow row. Bodies are stored as plain text, so the
+# sentiment_data view and the triggers are pure SQL and the file stays
+# readable from any SQLite client. The view puts the old columns back
+# together for readers, and the admin filters run on the integer ts
+# column and its indexes.
+#
+# The migration renames an existing sentiment_data table to
+# sentiment_legacy. A small one is converted on the spot; a large one is
+# moved over by compact.py in short transactions while the app keeps
+# running, and until then the view is the UNION of both tables. Moved rows
+# keep their ids, bucket, label and text, so they are already counted in
+# the rollups and indexed for search under the same id: the old table's
+# delete triggers are dropped, and the new insert triggers skip ids up to
+# the old table's AUTOINCREMENT sequence. Word-count marks and backfill
+# checkpoints stay valid too.
+TEXT_HASH_BYTES = 16
+COMPACT_CHUNK_ROWS = 2000    # legacy rows moved per transaction
+COMPACT_INLINE_ROWS = 20000  # legacy tables up to this size are converted by the migration itself
+_TEXT_OF_SQL = "(SELECT body FROM texts WHERE id = {row}.text_id)"
+_EPOCH_TIMESTAMP_SQL = "datetime({row}.ts, 'unixepoch', 'localtime')"
+_LABEL_ID_SQL = "CASE {row}.label WHEN 1 THEN 'Positive' ELSE 'Negative' END"
+_LEGACY_TS_SQL = "COALESCE(CAST(strftime('%s', timestamp, 'utc') AS INTEGER), 0)"
+_LEGACY_LABEL_SQL = "instr(COALESCE(prediction, ''), 'Positive') > 0"
+_NOT_MOVED_SQL = "NEW.id > COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'sentiment_legacy'), 0)"
+
+
+def store_texts(conn, texts):
+    # texts.id of each of `texts`, inserting those not stored yet. Call it
+    # inside a write_transaction, so no other writer can store the same
+    # text between the lookup and the insert.
+    ids = {}
+    for text in texts:
+        text = text or ""
+        if text not in ids:
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=TEXT_HASH_BYTES).digest()
+            row = conn.execute("SELECT id FROM texts WHERE hash = ?", (digest,)).fetchone()
+            ids[text] = row[0] if row else conn.execute("INSERT INTO texts (hash, body) VALUES (?, ?)",
+                                                         (digest, text)).lastrowid
+    return [ids[text or ""] for text in texts]
+
+
+def create_text_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS texts (
+        id INTEGER PRIMARY KEY,
+        hash BLOB NOT NULL UNIQUE,
+        body TEXT NOT NULL
+    )''')
+
+
+def create_prediction_tables(c):
+    # predictions, its indexes, and the triggers feeding sentiment_rollup
+    # and sentiment_fts; either of those that is missing is created and
+    # rebuilt from the sentiment_data view
+    c.execute('''CREATE TABLE IF NOT EXISTS predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        username TEXT,
+        text_id INTEGER NOT NULL REFERENCES texts (id),
+        label INTEGER NOT NULL,
+        score REAL,
+        confidence REAL,
+        model_version TEXT
+    )''')
+    # admin views filter by time and user; label (0/1 takes no record
+    # space) makes both covering for the counts and charts
+    c.execute("CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts, label)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_predictions_user_ts ON predictions (username, ts, label)")
+
+    rollups_exist = _create_rollup_table(c)
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_predictions_rollup_insert
+        AFTER INSERT ON predictions WHEN {_NOT_MOVED_SQL} BEGIN
+        {_rollup_upserts("NEW", 1, _EPOCH_TIMESTAMP_SQL, _LABEL_ID_SQL)}
+        END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_predictions_rollup_delete
+        AFTER DELETE ON predictions BEGIN
+        {_rollup_upserts("OLD", -1, _EPOCH_TIMESTAMP_SQL, _LABEL_ID_SQL)}
+        END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_predictions_rollup_update
+        AFTER UPDATE OF username, label, ts ON predictions BEGIN
+        {_rollup_upserts("OLD", -1, _EPOCH_TIMESTAMP_SQL, _LABEL_ID_SQL)}
+        {_rollup_upserts("NEW", 1, _EPOCH_TIMESTAMP_SQL, _LABEL_ID_SQL)}
+        END""")
+
+    search_exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='sentiment_fts'").fetchone()
+    c.execute(_SEARCH_TABLE_SQL)
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_predictions_fts_insert
+        AFTER INSERT ON predictions WHEN {_NOT_MOVED_SQL} BEGIN
+        INSERT INTO sentiment_fts (rowid, text) VALUES (NEW.id, {_TEXT_OF_SQL.format(row="NEW")});
+        END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_predictions_fts_delete
+        AFTER DELETE ON predictions BEGIN
+        INSERT INTO sentiment_fts (sentiment_fts, rowid, text)
+        VALUES ('delete', OLD.id, {_TEXT_OF_SQL.format(row="OLD")});
+        END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_predictions_fts_update
+        AFTER UPDATE OF text_id ON predictions BEGIN
+        INSERT INTO sentiment_fts (sentiment_fts, rowid, text)
+        VALUES ('delete', OLD.id, {_TEXT_OF_SQL.format(row="OLD")});
+        INSERT INTO sentiment_fts (rowid, text) VALUES (NEW.id, {_TEXT_OF_SQL.format(row="NEW")});
+        END""")
+
+    if not rollups_exist:
+        rebuild_rollups(c)
+    if not search_exists:
+        c.execute("INSERT INTO sentiment_fts (sentiment_fts) VALUES ('rebuild')")
+
+
+def _create_sentiment_view(c, legacy):
+    # the old sentiment_data columns, plus label, score, ts and model_version
+    c.execute("DROP VIEW IF EXISTS sentiment_data")
+    # the text is a subquery rather than a join, so that queries which
+    # don't select it (counts, charts) never touch texts
+    sql = ("CREATE VIEW sentiment_data AS "
+           f"SELECT p.id AS id, p.username AS username, {_TEXT_OF_SQL.format(row='p')} AS text, "
+           f"{_LABEL_ID_SQL.format(row='p')} AS prediction, p.confidence AS confidence, "
+           f"{_EPOCH_TIMESTAMP_SQL.format(row='p')} AS timestamp, p.label AS label, p.score AS score, "
+           "p.ts AS ts, p.model_version AS model_version FROM predictions p")
+    if legacy:
+        sql += (" UNION ALL "
+                f"SELECT id, username, text, {_LABEL_SQL.format(row='sentiment_legacy')}, confidence, timestamp, "
+                f"{_LEGACY_LABEL_SQL}, score, {_LEGACY_TS_SQL}, model_version FROM sentiment_legacy")
+    c.execute(sql)
+
+
+def migrate_compact_storage(c):
+    legacy_rows = c.execute("SELECT COUNT(*) FROM sentiment_data").fetchone()[0]
+    c.execute("ALTER TABLE sentiment_data RENAME TO sentiment_legacy")
+    c.execute("DROP TRIGGER trg_sentiment_rollup_delete")
+    c.execute("DROP TRIGGER trg_sentiment_fts_delete")
+    create_text_tables(c)
+    create_prediction_tables(c)
+    # new rows are numbered after every legacy id
+    c.execute("INSERT INTO sqlite_sequence (name, seq) "
+              "SELECT 'predictions', COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'sentiment_legacy'")
+    inline = legacy_rows <= COMPACT_INLINE_ROWS
+    if inline:
+        while _move_legacy_rows(c, COMPACT_CHUNK_ROWS):
+            pass
+        c.execute("DROP TABLE sentiment_legacy")
+    else:
+        log.warning("%d sentiment rows are in the pre-compaction layout; run compact.py to convert them",
+                    legacy_rows)
+    _create_sentiment_view(c, legacy=not inline)
+
+
+def _has_legacy_table(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sentiment_legacy'").fetchone() \
+        is not None
+
+
+def _move_legacy_rows(c, limit):
+    # Moves the newest `limit` sentiment_legacy rows to predictions, ids
+    # kept, and returns how many it moved
+    rows = c.execute(f"SELECT id, username, text, {_LEGACY_LABEL_SQL}, confidence, {_LEGACY_TS_SQL}, score, "
+                     "model_version FROM sentiment_legacy ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    if rows:
+        text_ids = store_texts(c, [row[2] for row in rows])
+        c.execute("DELETE FROM sentiment_legacy WHERE id >= ?", (rows[-1][0],))
+        c.executemany("INSERT INTO predictions (id, username, text_id, label, confidence, ts, score, model_version) "
+                      "VALUES (?,?,?,?,?,?,?,?)",
+                      [(row_id, username, text_id, *rest)
+                       for (row_id, username, _, *rest), text_id in zip(rows, text_ids)])
+    return len(rows)
+
+
+def count_legacy_rows(db_path=DB_PATH):
+    with connection(db_path) as conn:
+        if not _has_legacy_table(conn):
+            return 0
+        return conn.execute("SELECT COUNT(*) FROM sentiment_legacy").fetchone()[0]
+
+
+def compact_legacy_chunk(limit=COMPACT_CHUNK_ROWS, db_path=DB_PATH):
+    # Moves up to `limit` legacy rows in one short write transaction and
+    # returns how many. The call that finds sentiment_legacy empty drops it
+    # and points the view at predictions alone.
+    with connection(db_path) as conn:
+        with write_transaction(conn):
+            if not _has_legacy_table(conn):
+                return 0
+            moved = _move_legacy_rows(conn, limit)
+            if not moved:
+                _create_sentiment_view(conn, legacy=False)
+                conn.execute("DROP TABLE sentiment_legacy")
+    return moved
+
+
+def prune_texts(db_path=DB_PATH):
+    # deletes texts no prediction refers to any more, e.g. after a user's
+    # rows were deleted; returns how many
+    with connection(db_path) as conn:
+        with write_transaction(conn):
+            return conn.execute("DELETE FROM texts WHERE id NOT IN (SELECT text_id FROM predictions)").rowcount
+
+
+def vacuum(db_path=DB_PATH):
+    # Rewrites the file without the pages compaction freed (SQLite reuses
+    # them for new rows, but never returns them to the filesystem). Unlike
+    # the rest of this section it blocks writers until it is done.
+    with connection(db_path) as conn:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
@@ -0,0 +1,113 @@
+import sqlite3
+
+import pytest
+
+import storage
+
+# Legacy sentiment_data -> migration 8 -> compact.py -> the same rows read,
+# searched and deleted through the view, with every check made from a
+# plain sqlite3 connection (no functions registered) as any SQLite client
+# would open the file.
+LONG_TEXT = "a long and happy review of a phone " * 20
+TEXTS = ["good phone", "bad weather today", "good phone", LONG_TEXT, "sad game", "bad weather today"]
+# label is left out: the legacy column has no integer affinity
+VIEW_COLUMNS = "id, username, text, prediction, confidence, timestamp, score, model_version"
+
+
+def legacy_db(path, n=60):
+    # a database at the schema before migration 8 holding n predictions
+    conn = sqlite3.connect(path)
+    storage.migrate(conn, target=7)
+    conn.executemany("INSERT INTO sentiment_data (username, text, prediction, confidence, timestamp, label, score, "
+                     "model_version) VALUES (?,?,?,?,?,?,?,?)",
+                     [(f"user{i % 3}", TEXTS[i % len(TEXTS)], "Positive" if i % 2 else "Negative", i / n,
+                       f"2025-03-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00", i % 2, i - n / 2, "v1")
+                      for i in range(n)])
+    conn.commit()
+    conn.close()
+
+
+def plain(path):
+    return sqlite3.connect(path, isolation_level=None)
+
+
+def rows(path):
+    return plain(path).execute(f"SELECT {VIEW_COLUMNS} FROM sentiment_data ORDER BY id").fetchall()
+
+
+def rollups(path):
+    return plain(path).execute("SELECT * FROM sentiment_rollup WHERE count != 0 ORDER BY 1, 2, 3, 4").fetchall()
+
+
+def rebuilt_rollups(path):
+    conn = plain(path)
+    conn.execute("BEGIN")
+    storage.rebuild_rollups(conn.cursor())
+    expected = conn.execute("SELECT * FROM sentiment_rollup WHERE count != 0 ORDER BY 1, 2, 3, 4").fetchall()
+    conn.execute("ROLLBACK")
+    return expected
+
+
+def assert_consistent(path):
+    plain(path).execute("INSERT INTO sentiment_fts (sentiment_fts) VALUES ('integrity-check')")
+    assert rollups(path) == rebuilt_rollups(path)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # small enough tables are converted by the migration itself; make this
+    # one take the online path
+    monkeypatch.setattr(storage, "COMPACT_INLINE_ROWS", 10)
+    path = str(tmp_path / "senti.db")
+    legacy_db(path)
+    return path
+
+
+def test_legacy_rows_readable_while_compacting(db):
+    before = rows(db)
+    storage.create_main_tables(db)
+    assert storage.count_legacy_rows(db) == 60
+    assert plain(db).execute("SELECT count(*) FROM sentiment_data").fetchone() == (60,)
+
+    storage.insert_sentiment_rows([("user9", "good phone", "Positive", 0.9, "2025-04-01 12:00:00", 1.5, "v2")], db)
+    assert storage.compact_legacy_chunk(25, db) == 25
+    assert 0 < storage.count_legacy_rows(db) < 60
+    assert_consistent(db)
+
+    while storage.compact_legacy_chunk(25, db):
+        pass
+    assert storage.count_legacy_rows(db) == 0
+    after = rows(db)
+    assert after[:60] == before
+    assert after[60][:4] == (61, "user9", "good phone", "Positive")
+    # each distinct text is stored once
+    assert plain(db).execute("SELECT count(*) FROM texts").fetchone() == (len(set(TEXTS)),)
+    assert_consistent(db)
+
+
+def test_compacted_db_search_and_delete(db):
+    storage.create_main_tables(db)
+    while storage.compact_legacy_chunk(25, db):
+        pass
+    found, _ = storage.search_sentiment("happy review", db_path=db, limit=100)
+    assert {row["text"] for row in found} == {LONG_TEXT}
+    counts = storage.sentiment_counts(db_path=db)
+
+    conn = plain(db)
+    deleted = conn.execute("DELETE FROM predictions WHERE text_id = (SELECT id FROM texts WHERE body = ?)",
+                           (LONG_TEXT,)).rowcount
+    assert deleted == 10
+    assert storage.search_sentiment("happy review", db_path=db) == ([], None)
+    assert sum(storage.sentiment_counts(db_path=db).values()) == sum(counts.values()) - deleted
+    assert_consistent(db)
+    assert storage.prune_texts(db) == 1
+
+
+def test_small_legacy_table_converted_by_migration(tmp_path):
+    path = str(tmp_path / "senti.db")
+    legacy_db(path, n=8)
+    before = rows(path)
+    storage.create_main_tables(path)
+    assert storage.count_legacy_rows(path) == 0
+    assert rows(path) == before
+    assert_consistent(path)
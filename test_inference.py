@@ -0,0 +1,50 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+import inference
+
+# LinearScorer must agree with the sklearn pipeline it is extracted from,
+# both built in memory and reloaded from its mmap artifact.
+pytest.importorskip("sklearn")
+if not os.path.exists(inference.MODEL_PATH):
+    pytest.skip(f"{inference.MODEL_PATH} not found", allow_module_level=True)
+
+EDGE_CASES = ["", "!!!", "I LOVE this, not bad at all", "Ünïcode café, naïve résumé", "great great great",
+              "bad " * 200]
+
+
+@pytest.fixture(scope="module")
+def model():
+    return inference.load_model()
+
+
+@pytest.fixture(scope="module")
+def posts(model):
+    # fixed sample built from the model's own vocabulary
+    rng = random.Random(0)
+    vocab = sorted(term for term in model[0].vocabulary_ if " " not in term)
+    return [" ".join(rng.choices(vocab, k=rng.randint(1, 40))) for _ in range(1000)] + EDGE_CASES
+
+
+def assert_parity(scorer, model, posts):
+    predictions, scores = scorer.predict_batch(posts)
+    assert np.array_equal(predictions, model.predict(posts))
+    np.testing.assert_allclose(scores, model.decision_function(posts), rtol=0, atol=1e-9)
+    # the single-text path too
+    singles = posts[:100] + EDGE_CASES
+    np.testing.assert_allclose([scorer.score(p) for p in singles], model.decision_function(singles),
+                               rtol=0, atol=1e-9)
+
+
+def test_linear_scorer_matches_pipeline(model, posts):
+    assert_parity(inference.LinearScorer.from_pipeline(model), model, posts)
+
+
+def test_saved_artifact_matches_pipeline(model, posts, tmp_path):
+    inference.LinearScorer.from_pipeline(model).save(str(tmp_path), source_version="test")
+    scorer = inference.LinearScorer.load(str(tmp_path))
+    assert scorer.version == "test"
+    assert_parity(scorer, model, posts)
@@ -0,0 +1,46 @@
+import pytest
+
+import fake_reddit
+import reddit_ingest
+import storage
+
+# fetch_since_last against the local fake Reddit: a source's high-water
+# mark survives the newest stored post being deleted on Reddit's side.
+pytest.importorskip("praw")
+
+
+@pytest.fixture
+def server():
+    server = fake_reddit.FakeRedditServer(posts_per_source=10).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def ingestor(server):
+    return reddit_ingest.RedditIngestor(oauth_url=server.url, reddit_url=server.url,
+                                        bucket=reddit_ingest.TokenBucket(rate=1000, capacity=100))
+
+
+def ids(posts_by_source):
+    return [post["id"] for post in posts_by_source["u/alice"]]
+
+
+def test_new_posts_after_high_water_mark_deleted(server, ingestor, tmp_path):
+    db = str(tmp_path / "senti.db")
+    storage.create_main_tables(db)
+    assert ids(ingestor.fetch_since_last(["alice"], limit=3, db_path=db)) == ["ali000010", "ali000009", "ali000008"]
+
+    server.deleted.add("ali000010")
+    server.posts_per_source = 12
+    assert ids(ingestor.fetch_since_last(["alice"], limit=3, db_path=db)) == ["ali000012", "ali000011", "ali000010"]
+    # the mark has moved on to a post that still exists
+    server.posts_per_source = 13
+    assert ids(ingestor.fetch_since_last(["alice"], limit=3, db_path=db)) == ["ali000013", "ali000012", "ali000011"]
+
+
+def test_no_new_posts_keeps_cache(server, ingestor, tmp_path):
+    db = str(tmp_path / "senti.db")
+    storage.create_main_tables(db)
+    first = ids(ingestor.fetch_since_last(["alice"], limit=3, db_path=db))
+    assert ids(ingestor.fetch_since_last(["alice"], limit=3, db_path=db)) == first
@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import io
+import threading
+from collections import Counter, OrderedDict
+
+from wordcloud import STOPWORDS, WordCloud
+
+import inference
+import storage
+
+# ----------------------------
+# WORD CLOUDS
+# ----------------------------
+# Word frequencies are counted with the model's own tokenizer
+# (LinearScorer.tokens, the TF-IDF vectorizer's token pattern) instead of
+# WordCloud re-parsing one big joined string, and clouds are drawn with
+# generate_from_frequencies straight to PNG bytes, without a matplotlib
+# figure. Rendered images are cached by a hash of their input frequencies,
+# so repeating an analysis of the same posts costs one dict lookup.
+WIDTH, HEIGHT = 600, 400
+MAX_WORDS = 100  # layout time grows with the word count; 100 fills 600x400
+MIN_WORD_LENGTH = 3
+CACHE_SIZE = 64
+COLORMAPS = {"Positive": "Greens", "Negative": "Reds"}
+
+
+def word_frequencies(texts, tokenize, counter=None):
+    # Adds the words of `texts` to `counter` (a new Counter by default) and
+    # returns it, so frequencies can be built up incrementally
+    counter = Counter() if counter is None else counter
+    for text in texts:
+        counter.update(w for w in tokenize(text) if len(w) >= MIN_WORD_LENGTH and w not in STOPWORDS)
+    return counter
+
+
+def _top(frequencies, max_words=MAX_WORDS):
+    items = frequencies.most_common(max_words) if isinstance(frequencies, Counter) else list(frequencies)
+    # ties broken by word so equal inputs always hash alike
+    return sorted(items, key=lambda item: (-item[1], item[0]))[:max_words]
+
+
+class ImageCache:
+    # LRU of rendered PNGs keyed by content hash
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+            self.misses += 1
+        image = render()
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.maxsize:
+                self._images.popitem(last=False)
+        return image
+
+
+IMAGE_CACHE = ImageCache()
+
+
+def render_cloud(frequencies, colormap, width=WIDTH, height=HEIGHT, max_words=MAX_WORDS, cache=IMAGE_CACHE):
+    # frequencies: Counter or iterable of (word, count). Returns PNG bytes,
+    # or None when there are no words.
+    top = _top(frequencies, max_words)
+    if not top:
+        return None
+    key = hashlib.sha256(repr((top, colormap, width, height)).encode("utf-8")).hexdigest()
+
+    def render():
+        cloud = WordCloud(width=width, height=height, background_color="white", colormap=colormap,
+                          max_words=max_words, random_state=0).generate_from_frequencies(dict(top))
+        buf = io.BytesIO()
+        cloud.to_image().save(buf, format="PNG")
+        return buf.getvalue()
+
+    return cache.get_or_render(key, render)
+
+
+def sentiment_clouds(pos_texts, neg_texts, tokenize):
+    # {"Positive": png or None, "Negative": png or None}
+    return {"Positive": render_cloud(word_frequencies(pos_texts, tokenize), COLORMAPS["Positive"]),
+            "Negative": render_cloud(word_frequencies(neg_texts, tokenize), COLORMAPS["Negative"])}
+
+
+# ----------------------------
+# PRECOMPUTED FREQUENCY TABLES
+# ----------------------------
+_refresh_lock = threading.Lock()
+
+
+def refresh_word_counts(tokenize, chunk_size=5000, db_path=storage.DB_PATH):
+    # Counts the words of sentiment_data rows added since the last refresh
+    # into storage's word_counts table. Returns the number of rows counted.
+    # Rows re-labelled later (e.g. by backfill.py) keep their old label here
+    # until the table is rebuilt (--rebuild).
+    with _refresh_lock:  # two sessions must not count the same rows
+        return _refresh_word_counts(tokenize, chunk_size, db_path)
+
+
+def _refresh_word_counts(tokenize, chunk_size, db_path):
+    done = 0
+    after_id = storage.word_counts_high_water_mark(db_path)
+    for rows in storage.iter_sentiment_chunks(chunk_size=chunk_size, db_path=db_path, after_id=after_id):
+        counts = Counter()
+        for _, username, text, prediction, _, timestamp in rows:
+            key = ((timestamp or "")[:10], username or "", storage.normalize_prediction(prediction or ""))
+            for word, n in word_frequencies([text or ""], tokenize).items():
+                counts[key + (word,)] += n
+        storage.add_word_counts(counts, rows[-1][0], db_path)
+        done += len(rows)
+    return done
+
+
+def stored_sentiment_clouds(username=None, start=None, end=None, db_path=storage.DB_PATH):
+    # clouds from the word_counts table for a user and/or day range
+    return {label: render_cloud(storage.top_words(label, username, start, end, MAX_WORDS, db_path), colormap)
+            for label, colormap in COLORMAPS.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bring the word_counts table up to date")
+    parser.add_argument("--db", default=storage.DB_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="recount every row from scratch")
+    args = parser.parse_args()
+
+    storage.create_main_tables(args.db)
+    if args.rebuild:
+        storage.clear_word_counts(args.db)
+    n = refresh_word_counts(inference.load_scorer().tokens, db_path=args.db)
+    print(f"Counted words of {n} new rows")